@@ -1,12 +1,19 @@
+import argparse
+
 import pygame
 from .game import SIZE, game_loop
 
-from .gameobjects import World, Wall, Particle, Ghost, Explosion
+from .gameobjects import World, Wall, Particle, Ghost, GhostStore, Explosion
 from .forgetlist import Forgetlist
-from .geometry import Position, Line, line_point_collection, line_segments
+from .geometry import Position, Line, intersects, line_point_collection, line_segments
+from .visibility import visible_segments, visibility_polygon
 
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="museumghosts", description="Museum guard")
+    parser.add_argument("level", nargs="?", help="a compiled level bundle")
+    parser.add_argument("--record", metavar="PATH", help="record the game to PATH")
+    args = parser.parse_args(argv)
 
     pygame.init()
     pygame.display.set_mode((SIZE.x, SIZE.y))
@@ -14,7 +21,7 @@ def main():
     screen = pygame.display.get_surface()
     # pygame.mouse.set_visible(False)  # this should be a crosshair
 
-    game_loop(screen)
+    game_loop(screen, level=args.level, record=args.record)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+"""The static arrangement of the walls of a world.
+
+Walls never change once a game is set up, so everything that only depends on
+the walls (where they cross, the pieces they are cut into, which pieces meet
+at which points) is computed once and kept here.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from . import kernel
+from .geometry import Line, Position, _crossing_lines
+from .spatial import WallGrid
+
+
+Neighbourhood = namedtuple("Neighbourhood", "walls, segments, pieces")
+
+
+def split_lines(lines, crossings=None):
+    """Cut lines at their mutual crossings.
+
+    Returns the pieces as `Line`s, none of which cross each other except at
+    their endpoints.  `crossings` maps each line to the set of points where
+    other lines cross it, and is computed if not given.
+    """
+    if crossings is None:
+        crossings = _crossings(lines)
+    pieces = []
+    for line in dict.fromkeys(lines):
+        pieces += _cut(line, crossings.get(line, ()))
+    return pieces
+
+
+def _cut(line, points):
+    points = sorted(set(line) | set(points))
+    return [Line(points[idx], points[idx + 1]) for idx in range(len(points) - 1)]
+
+
+def _crossings(lines):
+    crossings = {line: set() for line in lines}
+    for line, point in _crossing_lines(lines):
+        crossings[line].add(point)
+    return crossings
+
+
+class Arrangement:
+    """The walls (or bare lines), cut into non-crossing pieces.
+
+    `crossings` maps every wall line to the points where other walls cross it,
+    `pieces` are the walls cut at these points, `piece_walls[i]` is the index
+    of the wall `pieces[i]` was cut from, and `adjacency` maps every piece
+    endpoint to the endpoints it is joined to by a piece.  `segments` and
+    `piece_segments` hold the same walls and pieces as arrays for `kernel`.
+    """
+
+    def __init__(self, walls):
+        self.walls = list(walls)
+        self.lines = [getattr(wall, "line", wall) for wall in self.walls]
+        self.segments = kernel.segments(self.lines)
+        self.crossings = _crossings(self.lines)
+
+        self.pieces = []
+        self.piece_walls = []
+        seen = set()
+        for idx, line in enumerate(self.lines):
+            if line in seen:
+                continue
+            seen.add(line)
+            for piece in _cut(line, self.crossings[line]):
+                self.pieces.append(piece)
+                self.piece_walls.append(idx)
+        self.piece_segments = kernel.segments(self.pieces)
+        self._adjacency = None
+        self._index = None
+
+    @classmethod
+    def from_arrays(cls, walls, segments, piece_segments, piece_walls, crossings):
+        """Rebuild an arrangement from the arrays of `to_arrays`, without
+        searching for crossings again.
+        """
+        arr = cls.__new__(cls)
+        arr.walls = list(walls)
+        arr.lines = [getattr(wall, "line", wall) for wall in arr.walls]
+        arr.segments = segments
+        arr.crossings = {line: set() for line in arr.lines}
+        for idx, x, y in crossings.tolist():
+            arr.crossings[arr.lines[int(idx)]].add(Position(x, y))
+        arr.pieces = [
+            Line(Position(x1, y1), Position(x2, y2))
+            for x1, y1, x2, y2 in piece_segments.tolist()
+        ]
+        arr.piece_walls = [int(idx) for idx in piece_walls]
+        arr.piece_segments = piece_segments
+        arr._adjacency = None
+        arr._index = None
+        return arr
+
+    def to_arrays(self):
+        """The pieces and crossings as flat arrays: (P, 4) piece segments,
+        (P,) indices of the walls of the pieces, and (C, 3) rows of wall
+        index and crossing point.
+        """
+        index = {}
+        for idx, line in enumerate(self.lines):
+            index.setdefault(line, idx)
+        crossings = [
+            (index[line], p.x, p.y)
+            for line, points in self.crossings.items()
+            for p in sorted(points)
+        ]
+        return (
+            self.piece_segments,
+            np.array(self.piece_walls, dtype=np.int64),
+            np.array(crossings, dtype=float).reshape(-1, 3),
+        )
+
+    @property
+    def adjacency(self):
+        if self._adjacency is None:
+            self._adjacency = {}
+            for p1, p2 in self.pieces:
+                self._adjacency.setdefault(p1, set()).add(p2)
+                self._adjacency.setdefault(p2, set()).add(p1)
+        return self._adjacency
+
+    @property
+    def index(self):
+        """A `spatial.WallGrid` over the walls, for segment queries."""
+        if self._index is None:
+            self._index = WallGrid(self.walls, self.segments)
+        return self._index
+
+    @property
+    def endpoints(self):
+        """The distinct wall endpoints, in wall order."""
+        return list(dict.fromkeys(p for line in self.lines for p in line))
+
+    @property
+    def everything(self):
+        """All walls and pieces, as a `Neighbourhood`."""
+        return Neighbourhood(self.walls, self.segments, self.pieces)
+
+    def crossing_wall(self, ray):
+        """Return a wall crossed by `ray`, or None."""
+        return self.index.crossing_wall(ray)
+
+    def __len__(self):
+        return len(self.pieces)
@@ -0,0 +1,244 @@
+"""Benchmarks of the hot paths, on synthetic scenarios.
+
+A scenario is a maze of `cols` by `rows` rooms, `walls` extra random walls
+and `ghosts` ghosts, all drawn from `seed`.  Every benchmark times one
+operation on the scenario, and the results are printed as JSON so runs can
+be compared across releases::
+
+    museumghosts-bench --cells 5x3 --walls 20 --ghosts 200 -o bench.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import namedtuple
+
+import pygame
+
+from . import graphics
+from .forgetlist import Forgetlist
+from .game import _update_ghosts, maze
+from .gameobjects import Ghost, Particle, Player, Wall, World
+from .geometry import Line, Position, crosses_wall, intersects, line_segments
+from .preprocessor import _gen_rects, _preprocess_cell
+
+Scenario = namedtuple(
+    "Scenario", "cols, rows, walls, ghosts, seed", defaults=(5, 3, 0, 8, 0)
+)
+
+
+def _randpos(rng, size, margin=0):
+    return Position(
+        rng.uniform(margin, size.x - margin), rng.uniform(margin, size.y - margin)
+    )
+
+
+def generate(scenario):
+    """Return the `World` of `scenario`, sized to fit its maze."""
+    rng = random.Random(scenario.seed)
+    scal = 200
+    size = Position(scenario.cols * scal + 100, scenario.rows * scal + 100)
+    corners = [Position(0, 0), Position(size.x, 0), size, Position(0, size.y)]
+    walls = [Wall(Line(a, b)) for a, b in zip(corners, corners[1:] + corners[:1])]
+
+    walls += maze(scenario.cols, scenario.rows, scal, seed=scenario.seed)
+    walls += [
+        Wall(Line(_randpos(rng, size), _randpos(rng, size)))
+        for _ in range(scenario.walls)
+    ]
+
+    ghosts = [
+        Ghost(
+            Particle(_randpos(rng, size, 25)),
+            time=0,
+            direction=Position(rng.uniform(-0.2, 0.2), rng.uniform(-0.2, 0.2)),
+        )
+        for _ in range(scenario.ghosts)
+    ]
+    player = Player(size / 2, vision=Position(size.x, size.y / 2))
+    return World(size, player, ghosts, walls, Forgetlist(1.5), Forgetlist(3.0))
+
+
+def _bench_intersects(world, rng):
+    walls = world.walls
+    pairs = [(rng.choice(walls), rng.choice(walls)) for _ in range(1000)]
+
+    def run():
+        for w1, w2 in pairs:
+            intersects(w1, w2, ray=False)
+
+    return run, len(pairs)
+
+
+def _bench_line_segments(world, rng):
+    arrangement = world.arrangement
+    povs = [_randpos(rng, world.size, 25) for _ in range(10)]
+
+    def run():
+        for pov in povs:
+            list(line_segments(pov, world.walls, arrangement=arrangement))
+
+    return run, len(povs)
+
+
+def _randlines(rng, size, n):
+    return [Line(_randpos(rng, size), _randpos(rng, size)) for _ in range(n)]
+
+
+def _bench_crosses_wall(world, rng):
+    rays = _randlines(rng, world.size, 100)
+
+    def run():
+        for ray in rays:
+            crosses_wall(world.walls, ray)
+
+    return run, len(rays)
+
+
+def _bench_crossing_wall(world, rng):
+    rays = _randlines(rng, world.size, 100)
+    world.arrangement.index  # built once per level, not per query
+
+    def run():
+        for ray in rays:
+            world.crossing_wall(ray)
+
+    return run, len(rays)
+
+
+def _bench_preprocess(world, rng):
+    # a full preprocess takes minutes on larger levels, so time a sample of
+    # its cells; the whole is the sum of its cells
+    cells = list(_gen_rects(world.size, 100))
+    cells = rng.sample(cells, min(2, len(cells)))
+
+    def run():
+        for rect in cells:
+            _preprocess_cell(world, rect)
+
+    return run, len(cells)
+
+
+def _bench_update_ghosts(world, rng):
+    return (lambda: _update_ghosts(world, 1.0, 20)), 1
+
+
+def _draw(world, rng, moving):
+    surface = pygame.Surface(world.size.tup)
+    povs = [_randpos(rng, world.size, 25) for _ in range(10)] if moving else []
+    worlds = [world.but(player=world.player.but(pos=pov)) for pov in povs] or [world]
+
+    def run():
+        for each in worlds:
+            graphics.draw_world(surface, each, now=1.0, flip=False)
+
+    return run, len(worlds)
+
+
+BENCHMARKS = {
+    "intersects": _bench_intersects,
+    "line_segments": _bench_line_segments,
+    "crosses_wall": _bench_crosses_wall,
+    "crossing_wall": _bench_crossing_wall,
+    "preprocess": _bench_preprocess,
+    "update_ghosts": _bench_update_ghosts,
+    "draw_world": lambda world, rng: _draw(world, rng, moving=False),
+    "draw_world_moving": lambda world, rng: _draw(world, rng, moving=True),
+}
+
+
+def run(scenario, names=None, repeat=5, min_time=0.05):
+    """Time the benchmarks `names` (default all) on `scenario`.
+
+    Every benchmark is called as often as it takes to run for `min_time`
+    seconds, `repeat` times over, and is reported in seconds per operation.
+    """
+    world = generate(scenario)
+    results = []
+    for name in names or BENCHMARKS:
+        rng = random.Random(scenario.seed)
+        graphics.vision_cache.clear()
+        func, ops = BENCHMARKS[name](world, rng)
+        # warm up, fill the caches a steady state has, and see how often
+        # to call it
+        start = time.perf_counter()
+        func()
+        once = time.perf_counter() - start
+        number = max(1, int(min_time / max(once, 1e-9)))
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            times.append((time.perf_counter() - start) / number / ops)
+        results.append(
+            {
+                "name": name,
+                "ops": ops,
+                "number": number,
+                "repeat": repeat,
+                "best": min(times),
+                "median": statistics.median(times),
+            }
+        )
+    return results
+
+
+def _cells(text):
+    cols, rows = text.lower().split("x")
+    return int(cols), int(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="museumghosts-bench", description="Benchmark the hot paths."
+    )
+    parser.add_argument(
+        "--cells", type=_cells, default=(5, 3), help="maze rooms, COLSxROWS"
+    )
+    parser.add_argument("--walls", type=int, default=0, help="extra random walls")
+    parser.add_argument("--ghosts", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "-k",
+        dest="names",
+        action="append",
+        choices=sorted(BENCHMARKS),
+        help="run only this benchmark, may be repeated",
+    )
+    parser.add_argument("-o", "--output", help="write the JSON here, not to stdout")
+    args = parser.parse_args(argv)
+
+    scenario = Scenario(*args.cells, args.walls, args.ghosts, args.seed)
+    world = generate(scenario)
+    # the maze is a tree of rooms, merged into fewer walls; a single room
+    # has none
+    maze_edges = scenario.cols * scenario.rows - 1
+    maze_walls = len(world.walls) - 4 - scenario.walls
+    reduction = 1 - maze_walls / maze_edges if maze_edges else None
+    report = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scenario": dict(
+            scenario._asdict(),
+            num_walls=len(world.walls),
+            wall_reduction=reduction,
+        ),
+        "results": run(scenario, args.names, args.repeat),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as fout:
+            fout.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,203 @@
+"""Compiled level bundles.
+
+A bundle holds everything about a level that does not change during a game:
+the walls, their arrangement and the potentially visible sets, all as flat
+little-endian arrays behind a fixed header.  Loading memory-maps the file and
+views the arrays in place, so nothing is recomputed or unpickled.
+
+Layout::
+
+    header    see _HEADER, padded to 8 bytes
+    walls     float64 (W, 4)
+    pieces    float64 (P, 4)
+    owners    int64   (P,)     wall index of every piece
+    crossings float64 (C, 3)   wall index, x, y
+    offsets   int64   (nx * ny + 1,)
+    indices   int64   (K,)     PVS wall indices, see preprocessor.PVS
+
+The header carries the SHA-256 of the walls, so a bundle compiled from other
+walls is recognized as stale, and the SHA-256 of everything after the header,
+so a damaged bundle is recognized as well.
+"""
+
+import argparse
+import hashlib
+import mmap
+import struct
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from . import kernel
+from .arrangement import Arrangement
+from .gameobjects import Wall
+from .geometry import Line, Position
+from .preprocessor import PVS
+
+MAGIC = b"MGHOSTLV"
+VERSION = 1
+
+# magic, version, width, height, cellsize, W, P, C, nx, ny, K,
+# sha256(walls), sha256(payload)
+_HEADER = struct.Struct("<8sI4x3d6Q32s32s")
+_HEADER_SIZE = _HEADER.size + (-_HEADER.size % 8)
+
+
+class BundleError(ValueError):
+    pass
+
+
+Level = namedtuple("Level", "size, walls, arrangement, pvs")
+
+
+def _digest(*arrays):
+    sha = hashlib.sha256()
+    for array in arrays:
+        sha.update(memoryview(np.ascontiguousarray(array)).cast("B"))
+    return sha.digest()
+
+
+def walls_digest(walls):
+    """The SHA-256 a bundle compiled from `walls` is stamped with."""
+    return _digest(np.asarray(kernel.segments(walls), dtype="<f8"))
+
+
+def compile_level(world, path, processes=1, progress=None):
+    """Write the walls, arrangement and PVS of `world` to `path`.
+
+    The PVS is computed (with `processes` workers) if the world has none.
+    """
+    arrangement = world.arrangement
+    pvs = world.pvs
+    if pvs is None:
+        pvs = PVS.from_world(world, processes=processes, progress=progress)
+    pieces, owners, crossings = arrangement.to_arrays()
+    arrays = [
+        np.asarray(arrangement.segments, dtype="<f8").reshape(-1, 4),
+        np.asarray(pieces, dtype="<f8").reshape(-1, 4),
+        np.asarray(owners, dtype="<i8"),
+        np.asarray(crossings, dtype="<f8").reshape(-1, 3),
+        np.asarray(pvs.offsets, dtype="<i8"),
+        np.asarray(pvs.indices, dtype="<i8"),
+    ]
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        world.size.x,
+        world.size.y,
+        pvs.cellsize,
+        len(arrays[0]),
+        len(arrays[1]),
+        len(arrays[3]),
+        pvs.shape[0],
+        pvs.shape[1],
+        len(arrays[5]),
+        _digest(arrays[0]),
+        _digest(*arrays),
+    )
+    with open(path, "wb") as fout:
+        fout.write(header.ljust(_HEADER_SIZE, b"\0"))
+        for array in arrays:
+            fout.write(array.tobytes())
+
+
+def _read_header(buf):
+    if len(buf) < _HEADER_SIZE:
+        raise BundleError("not a level bundle: too short")
+    fields = _HEADER.unpack_from(buf)
+    magic, version = fields[:2]
+    if magic != MAGIC:
+        raise BundleError("not a level bundle: bad magic {!r}".format(magic))
+    if version != VERSION:
+        raise BundleError(
+            "stale level bundle: format {}, expected {}".format(version, VERSION)
+        )
+    return fields[2:]
+
+
+def load_level(path, walls=None, verify=True):
+    """Memory-map the bundle at `path` and return a `Level`.
+
+    Raises `BundleError` if the file is not a bundle of this format version,
+    if `verify` is set and its contents do not match the checksum, or if
+    `walls` is given and the bundle was compiled from other walls.
+    """
+    with open(path, "rb") as fin:
+        buf = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+    width, height, cellsize, W, P, C, nx, ny, K, walls_sha, sha = _read_header(buf)
+
+    shapes = [
+        ("<f8", (W, 4)),
+        ("<f8", (P, 4)),
+        ("<i8", (P,)),
+        ("<f8", (C, 3)),
+        ("<i8", (nx * ny + 1,)),
+        ("<i8", (K,)),
+    ]
+    arrays = []
+    offset = _HEADER_SIZE
+    for dtype, shape in shapes:
+        count = int(np.prod(shape))
+        if offset + 8 * count > len(buf):
+            raise BundleError("truncated level bundle")
+        array = np.frombuffer(buf, dtype=dtype, count=count, offset=offset)
+        arrays.append(array.reshape(shape))
+        offset += 8 * count
+    segments, pieces, owners, crossings, offsets, indices = arrays
+
+    if verify and _digest(*arrays) != sha:
+        raise BundleError("corrupt level bundle: checksum mismatch")
+    if walls is not None and walls_digest(walls) != walls_sha:
+        raise BundleError("stale level bundle: compiled from other walls")
+
+    level_walls = [
+        Wall(Line(Position(x1, y1), Position(x2, y2)))
+        for x1, y1, x2, y2 in segments.tolist()
+    ]
+    arrangement = Arrangement.from_arrays(
+        level_walls, segments, pieces, owners, crossings
+    )
+    pvs = PVS.from_arrays(arrangement, cellsize, (nx, ny), offsets, indices)
+    return Level(Position(width, height), level_walls, arrangement, pvs)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="museumghosts-level", description="Compile or inspect level bundles."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    compile_ = commands.add_parser("compile", help="generate and compile a level")
+    compile_.add_argument("path")
+    compile_.add_argument("--seed", type=int, default=None)
+    compile_.add_argument(
+        "--processes", type=int, default=None, help="default: all cores"
+    )
+    info = commands.add_parser("info", help="describe a compiled level")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "compile":
+        from .game import setup_game
+        from .util import seed
+
+        seed(args.seed)
+        world = setup_game()
+        compile_level(world, args.path, processes=args.processes, progress=True)
+        print("{}: {} walls".format(args.path, len(world.walls)))
+    else:
+        level = load_level(args.path)
+        print(
+            "{}: {}x{}, {} walls, {} pieces, {} cells".format(
+                args.path,
+                level.size.x,
+                level.size.y,
+                len(level.walls),
+                len(level.arrangement),
+                len(level.pvs),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,89 @@
+"""Headless, fixed time step simulation.
+
+`Engine` advances a `World` the way `game.game_loop` does, but on a
+simulated clock: every tick is `dt` seconds, whatever time it takes to
+compute, and the input comes from a script instead of pygame's event queue.
+Nothing needs a display, and rendering to an off-screen surface is optional.
+"""
+
+from collections import namedtuple
+
+from .game import MOVEMENT_KEYS, _tick, game_status, setup_game
+from .geometry import Position
+from .graphics import draw_world
+
+Input = namedtuple("Input", "keys, vision, fire", defaults=((), None, False))
+Input.__doc__ = """The input of one tick.
+
+`keys` are the movement keys held down (pygame key codes, see
+`game.MOVEMENT_KEYS`), `vision` is where the guard looks (the mouse
+position), or None to keep looking where the guard looked, and `fire` tells
+whether the guard shoots.
+"""
+
+NO_INPUT = Input()
+
+
+class Engine:
+    """Run a world on a simulated clock, `dt` seconds per tick.
+
+    `surface`, if given, is drawn on after every tick.
+    """
+
+    def __init__(self, world=None, dt=0.02, surface=None):
+        self.dt = dt
+        self.ticks = 0
+        self.surface = surface
+        self.world = setup_game(clock=self.clock) if world is None else world
+
+    @property
+    def world(self):
+        return self._world
+
+    @world.setter
+    def world(self, world):
+        self._world = world
+        self.status = game_status(world)
+
+    def clock(self):
+        """The simulated time, in seconds; a clock for `Forgetlist`."""
+        return self.ticks * self.dt
+
+    def step(self, inp=NO_INPUT):
+        """Advance one tick with the input `inp`, and return the game status."""
+        if self.status is not None:
+            return self.status
+        world = self.world
+        now = self.clock()
+        if inp.vision is not None:
+            world = world.but(player=world.player.but(vision=Position(*inp.vision)))
+        if inp.fire:
+            world = world.fire(now)
+        keys = [key for key in MOVEMENT_KEYS if key in inp.keys]
+        self.world = _tick(world, now, self.dt * 1000, keys)
+        self.ticks += 1
+        if self.surface is not None:
+            draw_world(self.surface, self.world, now=self.clock(), flip=False)
+        return self.status
+
+    def run(self, script, ticks=None):
+        """Run the inputs of `script` until the game is over, `ticks` ticks
+        have passed or the script runs out; return the game status.
+
+        `script` is an iterable of `Input`s, one per tick, or a function of
+        the world and the tick number returning an `Input`.
+        """
+        if callable(script):
+            policy = script
+
+            def inputs():
+                while True:
+                    yield policy(self.world, self.ticks)
+
+            script = inputs()
+        for count, inp in enumerate(script):
+            if ticks is not None and count >= ticks:
+                break
+            if self.step(inp) is not None:
+                break
+        return self.status
@@ -1,69 +1,79 @@
 import time
+from collections import deque
 
 
 class Forgetlist:
-    class _Node:
-        def __init__(self, payload, timestamp):
-            self.payload = payload
-            self.timestamp = timestamp
+    """A list that forgets its elements `duration` seconds after they were
+    appended.
 
-    def __init__(self, duration, clock=None, maxsize=2 ** 16):
+    The elements are kept oldest first in a deque, so appending and
+    forgetting are amortized O(1), and counted in a side index, so membership
+    is O(1); the elements must be hashable.  At most `maxsize` elements are
+    kept, the oldest are forgotten early to make room.  `on_expire`, if
+    given, is called with the list of elements forgotten at once, oldest
+    first.
+    """
+
+    def __init__(self, duration, clock=None, maxsize=2 ** 16, on_expire=None):
         self._duration = duration
-        self._idx = 0
-        self._lst = []
+        self._items = deque()  # (timestamp, payload), oldest first
+        self._index = {}  # payload -> number of times it is in _items
         self.clock = time.time if clock is None else clock  # primarily for mocking
         self.start = self.clock()
         self.maxsize = maxsize
+        self.on_expire = on_expire
 
     def now(self):
-        return round(self.clock() - self.start, 3)
-
-    def _valid(self, idx=None):
-        if idx is None:
-            idx = self._idx
-        now = self.now()
-        diff = now - (self._lst[idx].timestamp + self._duration)
-        return diff < 0
+        return self.clock() - self.start
 
     @property
     def duration(self):
         return self._duration
 
-    def __ffw(self):
-        if self._idx > self.maxsize:
-            self._lst = self._lst[self._idx :]
-            self._idx = 0
-        while self._idx < len(self._lst) and not self._valid():
-            self._idx += 1
+    def _forget(self, now=None):
+        """Forget the elements that have expired by `now`, the clock read
+        once, and the oldest beyond `maxsize`.
+        """
+        if now is None:
+            now = self.now()
+        items = self._items
+        deadline = now - self._duration
+        forgotten = []
+        while items and (items[0][0] <= deadline or len(items) > self.maxsize):
+            _, payload = items.popleft()
+            count = self._index[payload] - 1
+            if count:
+                self._index[payload] = count
+            else:
+                del self._index[payload]
+            forgotten.append(payload)
+        if forgotten and self.on_expire is not None:
+            self.on_expire(forgotten)
 
     def append(self, obj):
-        self._lst.append(Forgetlist._Node(obj, timestamp=self.now()))
+        """Append `obj`, and return the Forgetlist."""
+        now = self.now()
+        self._items.append((now, obj))
+        self._index[obj] = self._index.get(obj, 0) + 1
+        self._forget(now)
+        return self
 
     def __iter__(self):
-        self.__ffw()
-        i = self._idx
-        while i < len(self._lst):
-            if self._valid(i):
-                yield self._lst[i].payload
-            i += 1
+        self._forget()
+        return (payload for _, payload in self._items)
 
     def __len__(self):
-        self.__ffw()
-        return len(self._lst) - self._idx
+        self._forget()
+        return len(self._items)
 
     def __contains__(self, obj):
-        self.__ffw()
-        for elt in self:
-            if elt.payload == obj:
-                return True
-        return False
+        self._forget()
+        return obj in self._index
 
     def __getitem__(self, idx):
-        self.__ffw()
-        return (
-            self._lst[self._idx + idx].payload if idx >= 0 else self._lst[idx].payload
-        )
+        self._forget()
+        return self._items[idx][1]
 
     def __str__(self):
         elts = ",".join([str(x) for x in self])
-        return "<{} ⏱ [{}]>".format(self.now(), elts)
+        return "<{} ⏱ [{}]>".format(round(self.now(), 3), elts)
@@ -1,12 +1,22 @@
+import random
+import time
+from collections import defaultdict
+
 import pygame
 
 from .gameobjects import World, Wall, Particle, Player, Ghost, Explosion
+from .gameobjects import GHOST_SIZE, GhostStore
 from .forgetlist import Forgetlist
 from .geometry import Position, Line
-from .util import randpos, randline
+from . import util
+from .util import randpos, randline, rng
 from .graphics import draw_world
+from .stats import frame_stats
+from .recording import Recorder, event_fields
 
 from .mazegen import random_maze
+from .preprocessor import PVS
+from .bundle import load_level
 
 
 _WIDTH = 1100
@@ -14,64 +24,58 @@ _HEIGHT = 700
 SIZE = Position(_WIDTH, _HEIGHT)
 
 
-def merge(e1, e2):
-    p11, p12 = e1
-    p21, p22 = e2
-    x11, y11 = p11
-    x12, y12 = p12
-    x21, y21 = p21
-    x22, y22 = p22
-    # horizontal
-    if y11 == y12 == y21 == y22 and x11 == x21:
-        return Line(Position(x12, y11), Position(x22, y11))
-    if y11 == y12 == y21 == y22 and x11 == x22:
-        return Line(Position(x12, y11), Position(x21, y11))
-    if y11 == y12 == y21 == y22 and x12 == x21:
-        return Line(Position(x11, y11), Position(x22, y11))
-    if y11 == y12 == y21 == y22 and x12 == x22:
-        return Line(Position(x11, y11), Position(x21, y11))
-    # vertical
-    if x11 == x12 == x21 == x22 and y11 == y21:
-        return Line(Position(x11, y12), Position(x11, y22))
-    if x11 == x12 == x21 == x22 and y11 == y22:
-        return Line(Position(x11, y12), Position(x11, y21))
-    if x11 == x12 == x21 == x22 and y12 == y21:
-        return Line(Position(x11, y11), Position(x11, y22))
-    if x11 == x12 == x21 == x22 and y12 == y22:
-        return Line(Position(x11, y11), Position(x11, y21))
-
-
-def maze():
-    scal = 200
-    M = random_maze(*(SIZE // scal).tup)
-
-    edges = set(M.edges)
-    edited = True
-    while edited:
-        edited = False
-        delete = set()
-        add = set()
-        for e1 in edges:
-            if edited:
-                break
-            for e2 in edges:
-                if e1 == e2:
-                    continue
-                m = merge(e1, e2)
-                if m:
-                    delete.add(e1)
-                    delete.add(e2)
-                    add.add(m)
-                    edited = True
-                    break
-        edges = (edges - delete) | add
-
-    for p1, p2 in M.edges:
-        line = Line(
-            Position(*p1) * scal + Position(100, 100),
-            Position(*p2) * scal + Position(100, 100),
-        )
-        yield Wall(line)
+def merge_collinear(edges):
+    """Merge the axis aligned `edges`, pairs of end points, that meet end to
+    end in the same row or column into single edges, in one pass.
+
+    Edges that are neither horizontal nor vertical are kept as they are.
+    """
+    lines = defaultdict(dict)  # row or column -> {start: end}
+    merged = []
+    for (x1, y1), (x2, y2) in edges:
+        if y1 == y2:
+            key, a, b = ("y", y1), min(x1, x2), max(x1, x2)
+        elif x1 == x2:
+            key, a, b = ("x", x1), min(y1, y2), max(y1, y2)
+        else:
+            merged.append(((x1, y1), (x2, y2)))
+            continue
+        runs = lines[key]
+        runs[a] = max(runs.get(a, b), b)
+
+    for (axis, c), runs in lines.items():
+        ends = set(runs.values())
+        # a run starts where no edge ends, and is followed edge to edge
+        for start in runs:
+            if start in ends:
+                continue
+            end = runs[start]
+            while end in runs:
+                end = runs[end]
+            if axis == "y":
+                merged.append(((start, c), (end, c)))
+            else:
+                merged.append(((c, start), (c, end)))
+    return merged
+
+
+def maze(cols=None, rows=None, scal=200, offset=Position(100, 100), seed=None):
+    """Return the walls of a random maze of `cols` by `rows` rooms of `scal`
+    pixels, the corridors merged into one wall each.
+
+    The maze is a tree of ``cols * rows - 1`` edges; merged, it takes about
+    40% fewer walls.  `seed` is passed on to `random_maze`, drawn from the
+    game's random numbers if not given.
+    """
+    if seed is None:
+        seed = rng.getrandbits(64)
+    if cols is None:
+        cols, rows = (SIZE // scal).tup
+    M = random_maze(cols, rows, seed=seed)
+    return [
+        Wall(Line(Position(*p1) * scal + offset, Position(*p2) * scal + offset))
+        for p1, p2 in merge_collinear(M.edges)
+    ]
 
 
 def _quit():
@@ -87,19 +91,42 @@ def _input():
         yield evt
 
 
-def setup_game():
-    player = Player(Position(SIZE.x // 2, SIZE.y // 2))
+def setup_game(pvs=False, level=None, clock=None):
+    """Set up a new game, in a fresh maze or in the compiled `level` bundle,
+    at the size the level was compiled for.
+
+    The explosions and the history forget by `clock`, wall-clock time if not
+    given.
+    """
+    size = SIZE
+    if level is not None:
+        level = load_level(level)
+        size = level.size
+
+    player = Player(Position(size.x // 2, size.y // 2))
     ghosts = [
-        Ghost(Particle(randpos(SIZE))),
-        Ghost(Particle(randpos(SIZE))),
-        Ghost(Particle(randpos(SIZE))),
-        Ghost(Particle(randpos(SIZE))),
-        Ghost(Particle(randpos(SIZE))),
-        Ghost(Particle(randpos(SIZE))),
-        Ghost(Particle(randpos(SIZE))),
-        Ghost(Particle(randpos(SIZE))),
+        Ghost(Particle(randpos(size))),
+        Ghost(Particle(randpos(size))),
+        Ghost(Particle(randpos(size))),
+        Ghost(Particle(randpos(size))),
+        Ghost(Particle(randpos(size))),
+        Ghost(Particle(randpos(size))),
+        Ghost(Particle(randpos(size))),
+        Ghost(Particle(randpos(size))),
     ]
 
+    if level is not None:
+        return World(
+            size,
+            player,
+            ghosts,
+            level.walls,
+            Forgetlist(1.5, clock=clock),
+            Forgetlist(3.0, clock=clock),
+            level.arrangement,
+            level.pvs,
+        )
+
     bnw = Position(0, 0)
     bne = Position(SIZE.x, 0)
     bsw = Position(0, SIZE.y)
@@ -115,21 +142,18 @@ def setup_game():
     world = World(
         SIZE,
         player,
-        ghosts,
-        boundary + list(maze()),
-        Forgetlist(1.5),  # max ttl for explosions
-        Forgetlist(3.0),  # remember last three seconds of events
+        GhostStore.from_ghosts(ghosts),
+        boundary + maze(),
+        Forgetlist(1.5, clock=clock),  # max ttl for explosions
+        Forgetlist(3.0, clock=clock),  # remember last three seconds of events
     )
+    if pvs:
+        world = world.but(pvs=PVS.from_world(world))
     return world
 
 
 def _update_ghosts(world, now, elapsed=50):
-    ghosts = []
-
-    for ghost in world.ghosts:
-        ghosts += ghost.tick(world.size, now, elapsed)
-
-    return ghosts
+    return world.ghosts.tick(world.size, now, elapsed)
 
 
 def _handle_mousebuttondown(world, evt, now):
@@ -154,63 +178,122 @@ def _handle_movement(world, key, now):
     return world
 
 
+QUIT_KEYS = (pygame.K_q, pygame.K_ESCAPE)
+
+
 def _handle_keydown(world, evt, now):
     key = evt.key
-    if key in (pygame.K_q, pygame.K_ESCAPE):
+    if key in QUIT_KEYS:
         _quit()
 
     return _handle_movement(world, key, now)
 
 
+MOVEMENT_KEYS = (pygame.K_w, pygame.K_d, pygame.K_a, pygame.K_s)
+
+
+def game_status(world):
+    """Return why the game is over, "collision", "won" or "died", or None."""
+    if len(world.ghosts.near(world.player.pos, max(GHOST_SIZE))):
+        return "collision"
+    alive = world.ghosts.num_alive
+    if not alive:
+        return "won"
+    if alive > 100:
+        return "died"
+    return None
+
+
 def _exit_if_done(world):
-    numdead = sum([g.is_dead for g in world.ghosts])
-    num = len(world.ghosts)
-    if numdead == num:
-        pygame.quit()
-        quit("You won")
-    if num - numdead > 100:
+    status = game_status(world)
+    if status == "collision":
+        exit("collision dead")
+    if status is not None:
         pygame.quit()
-        quit("You died")
+        quit("You won" if status == "won" else "You died")
 
 
-def collision_detection(world):
-    player = world.player
-    for ghost in world.ghosts:
-        if not ghost.is_dead and player.pos.dist(ghost.pos) <= max(ghost.size):
-            exit("collision dead")
+def _tick(world, now, elapsed, keys=()):
+    """Advance `world` by one frame: move the guard by the movement `keys`
+    held down, and the ghosts by `elapsed` milliseconds.
+    """
+    moved = False
+    for key in keys:
+        world = _handle_movement(world, key, now)
+        moved = True
+    if not moved:
+        world = world.but(player=world.player.freeze())
+    return world.but(ghosts=_update_ghosts(world, now, elapsed))
 
 
-def game_loop(surface):
-    world = setup_game()
-    clock = pygame.time.Clock()
+_HANDLERS = {
+    pygame.MOUSEBUTTONDOWN: _handle_mousebuttondown,
+    pygame.MOUSEMOTION: _handle_mousemotion,
+    pygame.KEYDOWN: _handle_keydown,
+}
+
+
+def _step(world, now, elapsed, events, keys=()):
+    """Play one frame: handle the input `events`, remembering them in the
+    world's history, and `_tick`.
+    """
+    for evt in events:
+        world.history.append((now,) + event_fields(evt))
+        world = _HANDLERS[evt.type](world, evt, now)
+    return _tick(world, now, elapsed, keys)
 
-    handlers = {
-        pygame.MOUSEBUTTONDOWN: _handle_mousebuttondown,
-        pygame.MOUSEMOTION: _handle_mousemotion,
-        pygame.KEYDOWN: _handle_keydown,
-    }
-    while True:
-        collision_detection(world)
-        _exit_if_done(world)
-
-        now = pygame.time.get_ticks() / 1000.0  # milliseconds since init
-        elapsed = clock.get_time()
-
-        for evt in _input():  # flushing all events before drawing
-            if evt.type in handlers:
-                world = handlers[evt.type](world, evt, now)
-        keys = pygame.key.get_pressed()
-        moved = False
-        for k in (pygame.K_w, pygame.K_d, pygame.K_a, pygame.K_s):
-            if keys[k]:
-                world = _handle_movement(world, k, now)
-                moved = True
-        if not moved:
-            world = world.but(player=world.player.freeze())
-
-        world = world.but(player=world.player)
-
-        world = world.but(ghosts=_update_ghosts(world, now, elapsed))
-
-        draw_world(surface, world, now=now)
-        clock.tick(50)
+
+def _export_stats():
+    path = time.strftime("museumghosts-stats-%Y%m%d-%H%M%S.csv")
+    frame_stats.export(path)
+    print("frame stats written to", path)
+
+
+def _ticks():
+    return pygame.time.get_ticks() / 1000.0  # milliseconds since init
+
+
+def game_loop(surface, level=None, record=None):
+    """Play a game on `surface`, in a new maze or in the `level` bundle, and
+    record it to the file `record` if given.
+    """
+    seed = random.getrandbits(64)
+    util.seed(seed)
+    world = setup_game(level=level, clock=_ticks)
+    clock = pygame.time.Clock()
+    recorder = None
+    if record is not None:
+        recorder = Recorder(record, seed, level, MOVEMENT_KEYS)
+
+    overlay = False
+    try:
+        while True:
+            _exit_if_done(world)
+            frame_stats.begin()
+
+            now = _ticks()
+            elapsed = clock.get_time()
+
+            with frame_stats.stage("input"):
+                events = []
+                for evt in _input():  # flushing all events before drawing
+                    if evt.type == pygame.KEYDOWN and evt.key == pygame.K_F3:
+                        overlay = not overlay
+                    elif evt.type == pygame.KEYDOWN and evt.key == pygame.K_F4:
+                        _export_stats()
+                    elif evt.type in _HANDLERS:
+                        events.append(evt)
+                pressed = pygame.key.get_pressed()
+                keys = [key for key in MOVEMENT_KEYS if pressed[key]]
+                if recorder is not None:
+                    recorder.tick(now, elapsed, keys, events)
+
+            with frame_stats.stage("update"):
+                world = _step(world, now, elapsed, events, keys)
+
+            draw_world(surface, world, now=now, overlay=overlay)
+            frame_stats.end()
+            clock.tick(50)
+    finally:
+        if recorder is not None:
+            recorder.close()
@@ -1,13 +1,18 @@
 import math
-import random
+
+import numpy as np
 import pygame
 
 from .sprites import guard as guard_img
 from .sprites import ghost as ghost_img
 from .sprites import ghost_dead as ghost_dead_img
 
-from .graphics import draw_ghosts, draw_vision
-from .geometry import Position, Line, intersects, crosses_wall
+from . import hitscan, kernel
+from .arrangement import Arrangement
+from .spatial import PointHash
+from .graphics import draw_ghosts, draw_vision, inverted
+from .geometry import Position, Line
+from .util import rng
 
 
 GHOST_SIZE = Position(24, 24)
@@ -22,18 +27,80 @@ GUARD_SIZE = Position(24, 24)
 GUARD_PNG = guard_img
 GUARD_PNG = pygame.transform.scale(GUARD_PNG, GUARD_SIZE.tup)
 
+# for drawing on the inverted vision surface
+GHOST_INV = inverted(GHOST_PNG)
+GHOST_DEAD_INV = inverted(GHOST_DEAD_PNG)
+GUARD_INV = inverted(GUARD_PNG)
+
 
 TAU = 2 * math.pi
 
 
 class World:
-    def __init__(self, size, player, ghosts, walls, explosions, history):
+    def __init__(
+        self,
+        size,
+        player,
+        ghosts,
+        walls,
+        explosions,
+        history,
+        arrangement=None,
+        pvs=None,
+    ):
         self.size = size
         self.player = player
+        if not isinstance(ghosts, GhostStore):
+            ghosts = GhostStore.from_ghosts(ghosts)
         self.ghosts = ghosts
         self.walls = walls
         self.explosions = explosions
         self.history = history
+        self._arrangement = arrangement
+        self.pvs = pvs
+
+    @property
+    def arrangement(self):
+        """The walls cut at their crossings, built once and shared by every
+        world derived from this one with `but` that keeps the walls.
+        """
+        if self._arrangement is None:
+            self._arrangement = Arrangement(self.walls)
+        return self._arrangement
+
+    def near(self, pos):
+        """The walls that can matter at `pos`, as a `Neighbourhood`.
+
+        With a potentially visible set these are the walls potentially
+        visible from the cell of `pos`, otherwise all walls.
+        """
+        if self.pvs is not None and pos in self.pvs:
+            return self.pvs[pos]
+        return self.arrangement.everything
+
+    def crossing_wall(self, ray):
+        """Return a wall crossed by `ray`, or None."""
+        return self.arrangement.index.crossing_wall(ray)
+
+    def sees(self, points, chunk=1024):
+        """For each of the (N, 2) `points`, is it in view of the guard?
+
+        All lines of sight are tested in one batch, `chunk` at a time,
+        against every wall of `arrangement.index`.  The potentially visible
+        walls of `near` are sampled from a few points of a cell, so they may
+        miss a wall blocking the view from the guard's exact position; and
+        walking the grid cells of every line of sight in Python costs more
+        than testing all walls in NumPy.
+        """
+        pov = self.player.pos
+        walls = self.arrangement.index.segments
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        sight = np.hstack([np.broadcast_to(pov.tup, points.shape), points])
+        seen = np.empty(len(points), dtype=bool)
+        for start in range(0, len(points), chunk):
+            rows = slice(start, start + chunk)
+            seen[rows] = ~kernel.crossing(sight[rows], walls)
+        return seen
 
     def but(
         self,
@@ -43,41 +110,35 @@ class World:
         walls=None,
         explosions=None,
         history=None,
+        pvs=None,
     ):
         return World(
             size or self.size,
             player or self.player,
             ghosts or self.ghosts,
-            walls or self.walls,
-            explosions or self.explosions,
-            history or self.history,
+            self.walls if walls is None else walls,
+            self.explosions if explosions is None else explosions,
+            self.history if history is None else history,
+            self._arrangement if walls is None else None,
+            pvs or (self.pvs if walls is None else None),
         )
 
-    @staticmethod
-    def _intersects_ghost(ray, ghost):
-        rad = 24
-        x1 = ghost.pos.x + rad
-        y1 = ghost.pos.y + rad
-        x2 = ghost.pos.x - rad
-        y2 = ghost.pos.y - rad
-        if intersects(ray, Line(Position(x1, y1), Position(x2, y2)), ray=False):
-            return True
-
-    def fire(self, now):
-        player = self.player
-        ray = Line(player.pos, player.vision)
-        for idx in range(len(self.ghosts)):
-            ghost = self.ghosts[idx]
-            if ghost.is_dead:
-                continue
-            if self._intersects_ghost(ray, ghost):
-                nghosts = self.ghosts[:idx] + [ghost.kill()] + self.ghosts[idx + 1 :]
-
-                return self.but(
-                    ghosts=nghosts,
-                    explosions=self.explosions.append(Explosion(ray, now, 3)),
-                )
-        return self
+    def fire(self, now, rays=None):
+        """Shoot along `rays`, by default from the guard to where the guard
+        looks, killing the first ghost each shot hits before any wall.
+        """
+        if rays is None:
+            rays = [Line(self.player.pos, self.player.vision)]
+        rays = list(rays)
+        hits = hitscan.scan(self, rays)
+        killed = []
+        for ray, hit in zip(rays, hits):
+            if hit is not None and hit.ghost is not None:
+                killed.append(hit.ghost)
+                self.explosions.append(Explosion(Line(ray.p1, hit.point), now, 3))
+        if not killed:
+            return self
+        return self.but(ghosts=self.ghosts.kill(killed))
 
 
 class Wall:
@@ -128,13 +189,13 @@ class Player(Particle):
     def draw(self, surface, world):
         draw_vision(surface, world)
         draw_ghosts(surface, world)
-        surface.blit(GUARD_PNG, (self.pos - GUARD_SIZE / 2).tup)
+        surface.blit(GUARD_INV, (self.pos - GUARD_SIZE / 2).tup)
 
     def freeze(self):
         return self.but(direction=Position(0, 0))
 
     def _move(self, world, npos, direction):
-        if crosses_wall(world.walls, Line(self.pos, npos)):
+        if world.crossing_wall(Line(self.pos, npos)):
             return self.freeze().but(pos=self.pos).inside(world)
         return self.but(pos=npos, direction=direction).inside(world)
 
@@ -170,7 +231,7 @@ class Player(Particle):
 
 def _random_direction():
     # speed of ghost is (-0.2, 0.2)
-    return Position(1 - 2 * random.random(), 1 - 2 * random.random()) / 5
+    return Position(1 - 2 * rng.random(), 1 - 2 * rng.random()) / 5
 
 
 class Ghost:
@@ -246,6 +307,153 @@ class Ghost:
         return [self.but(particle=partic, direction=direction)]
 
 
+class GhostStore:
+    """All the ghosts of a world, as parallel arrays.
+
+    Row i holds the position, direction, spawn time and death of ghost i.
+    Rows are never removed, and new ghosts are appended, so a ghost keeps its
+    index for the rest of the game.  Like the rest of the world the store is
+    never changed in place: `tick` and `kill` return new stores.  Indexing
+    and iterating give `Ghost` objects.
+
+    The live ghosts are kept in a `PointHash` for `near` queries.  The hash
+    is updated, not rebuilt, by `tick` and `kill`, and handed over to the
+    store they return; the old store builds a new one if it is asked again.
+    The number of dead ghosts is counted along the same way.
+    """
+
+    def __init__(self, pos, direction, time, dead, num_dead=None, hash=None):
+        self.pos = pos
+        self.direction = direction
+        self.time = time
+        self.dead = dead
+        self.num_dead = int(dead.sum()) if num_dead is None else num_dead
+        self._hash = hash
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            self._hash = PointHash(self.pos)
+            self._hash.discard(np.flatnonzero(self.dead))
+        return self._hash
+
+    def _handover(self):
+        hash, self._hash = self._hash, None
+        return hash
+
+    def near(self, pos, radius):
+        """Rows of the live ghosts within `radius` of `pos`."""
+        return self.hash.near(self.pos, pos, radius)
+
+    @staticmethod
+    def from_ghosts(ghosts):
+        ghosts = list(ghosts)
+        return GhostStore(
+            kernel.points(g.pos for g in ghosts),
+            kernel.points(g.direction for g in ghosts),
+            np.array([g.time for g in ghosts], dtype=float),
+            np.array([g.is_dead for g in ghosts], dtype=bool),
+        )
+
+    def __len__(self):
+        return len(self.dead)
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        x, y = self.pos[idx].tolist()
+        dx, dy = self.direction[idx].tolist()
+        return Ghost(
+            Particle(Position(x, y)),
+            float(self.time[idx]),
+            Position(dx, dy),
+            bool(self.dead[idx]),
+        )
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def sprites(self, rows, inverted=False):
+        """The sprite and upper left corner of every ghost in `rows`, a
+        boolean mask, as a sequence for `Surface.blits`.
+        """
+        corners = (self.pos[rows] - GHOST_SIZE.x / 2).tolist()
+        dead = self.dead[rows].tolist()
+        alive, dead_sprite = GHOST_PNG, GHOST_DEAD_PNG
+        if inverted:
+            alive, dead_sprite = GHOST_INV, GHOST_DEAD_INV
+        return [
+            (dead_sprite if d else alive, corner) for d, corner in zip(dead, corners)
+        ]
+
+    @property
+    def num_alive(self):
+        return len(self) - self.num_dead
+
+    def kill(self, idx):
+        idx = np.unique(idx)
+        idx = idx[~self.dead[idx]]
+        dead = self.dead.copy()
+        dead[idx] = True
+        hash = self._handover()
+        if hash is not None:
+            hash.discard(idx)
+        num_dead = self.num_dead + len(idx)
+        return GhostStore(self.pos, self.direction, self.time, dead, num_dead, hash)
+
+    def tick(self, size, now, elapsed):
+        """Move all live ghosts, bouncing off the world's edges, and have
+        every live ghost older than 12 seconds spawn two more; `Ghost.tick`
+        for all ghosts at once.
+        """
+        width, height = size.x, size.y
+        alive = ~self.dead
+        direction = self.direction
+
+        pos = self.pos + direction * (elapsed * alive)[:, None]
+        ndir = direction.copy()
+        x, y = pos[:, 0], pos[:, 1]
+
+        # a ghost out on both axes takes the vertical bounce, like Ghost.tick
+        out = alive & ((x < 24) | (x > width - 24))
+        if out.any():
+            x[out] = np.where(x[out] < 24, 25, width - 25)
+            ndir[out] = direction[out] * (-1, 1)
+        out = alive & ((y < 24) | (y > height - 24))
+        if out.any():
+            y[out] = np.where(y[out] < 24, 25, height - 25)
+            ndir[out] = direction[out] * (1, -1)
+
+        spawn = alive & (now - self.time > 12)
+        hash = self._handover()
+        if not spawn.any():
+            if hash is not None:
+                hash.move(pos)
+            return GhostStore(pos, ndir, self.time, self.dead, self.num_dead, hash)
+
+        # spawning ghosts keep their direction from before the bounce
+        ndir[spawn] = direction[spawn]
+        time = self.time.copy()
+        time[spawn] = now
+        born = int(spawn.sum())
+        pos = np.concatenate([pos, pos[spawn] + 24, pos[spawn] - 24])
+        if hash is not None:
+            hash.move(pos)
+        return GhostStore(
+            pos,
+            np.concatenate(
+                [ndir, direction[spawn] * (-1, 1), direction[spawn] * (1, -1)]
+            ),
+            np.concatenate([time, np.full(2 * born, float(now))]),
+            np.concatenate([self.dead, np.zeros(2 * born, dtype=bool)]),
+            self.num_dead,
+            hash,
+        )
+
+
 class Explosion:
     def __init__(self, ray, start, ttl):
         self.ray = ray
@@ -259,7 +467,9 @@ class Explosion:
         red = done / self.ttl
         brightness = (2.2 ** math.log(done)) / self.ttl
         col = (red, brightness, 0)
-        pygame.draw.line(surface, col, round(self.ray.p1), round(self.ray.p2), 3)
+        return pygame.draw.line(
+            surface, col, round(self.ray.p1), round(self.ray.p2), 3
+        )
 
     def age(self, now):
         return now - self.start
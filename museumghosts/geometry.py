@@ -1,7 +1,13 @@
 import math
 
+import numpy as np
+
+from . import kernel
+
 
 class Position:
+    __slots__ = ("x", "y", "_hash")
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
@@ -60,13 +66,22 @@ class Position:
         return self.x == other.x and self.y == other.y
 
     def __hash__(self):
-        return hash((self.x, self.y))
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash((self.x, self.y))
+            return self._hash
+
+    def __repr__(self):
+        return "Position({}, {})".format(self.x, self.y)
 
     def __lt__(self, other):
         return self.tup < other.tup
 
 
 class Line:
+    __slots__ = ("p1", "p2", "_hash")
+
     def __init__(self, p1, p2):
         self.p1 = p1
         self.p2 = p2
@@ -81,7 +96,11 @@ class Line:
         return self.p1 == other.p1 and self.p2 == other.p2
 
     def __hash__(self):
-        return hash((hash(self.p1), hash(self.p2)))
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash((hash(self.p1), hash(self.p2)))
+            return self._hash
 
     def __repr__(self):
         return "Line({}, {})".format(self.p1, self.p2)
@@ -115,73 +134,112 @@ def intersects(line1, line2, ray=True):
         return Position(x, y)
 
 
+def _point(points, i, j):
+    x, y = points[i, j].tolist()
+    return Position(x, y)
+
+
 def _crossing_lines(lines):
-    N = len(lines)
-    for i in range(N):
-        l1 = lines[i]
-        for j in range(i + 1, N):
-            l2 = lines[j]
-            p = intersects(l1, l2, ray=False)
-            if p:
-                yield (l1, p)
-                yield (l2, p)
-
-
-def line_point_collection(pov, walls):
+    hits = kernel.intersect(lines, lines, ray=False)
+    for i, j in zip(*hits.mask.nonzero()):
+        if i < j:
+            p = _point(hits.points, i, j)
+            yield (lines[i], p)
+            yield (lines[j], p)
+
+
+def line_point_collection(pov, walls, arrangement=None):
     """Return all points that intersects the ray formed from
        the player to an edge.
+
+       The wall crossings are taken from `arrangement` if it is given.
     """
     lines = [wall.line for wall in walls]
     point_collection = {line: set([line.p1, line.p2]) for line in lines}
 
-    for l, p in _crossing_lines(lines):
-        point_collection[l].add(p)
-
-    for line in lines:
-        for edge in line:
-            ray = Line(pov, edge)
-            for wall in lines:
-                if wall == line:
-                    continue
-                ipoint = intersects(wall, ray, ray=True)
-                if ipoint:
-                    point_collection[wall].add(ipoint)
+    if arrangement is None:
+        for l, p in _crossing_lines(lines):
+            point_collection[l].add(p)
+    else:
+        for l in lines:
+            point_collection[l] |= arrangement.crossings[l]
+
+    rays = [Line(pov, edge) for line in lines for edge in line]
+    if not rays:
+        return point_collection
+
+    # a ray is never tested against the wall whose endpoint it was cast to
+    ids = {}
+    line_ids = np.array([ids.setdefault(line, len(ids)) for line in lines])
+    same = line_ids[:, None] == np.repeat(line_ids, 2)[None, :]
+
+    hits = kernel.intersect(lines, rays, ray=True)
+    for i, j in zip(*(hits.mask & ~same).nonzero()):
+        point_collection[lines[i]].add(_point(hits.points, i, j))
     return point_collection
 
 
-def _is_point_visible(pov, walls, belonging_wall, point):
-    ray = Line(pov, point)
-    for wall in walls:
-        if wall.line == belonging_wall:
-            continue
-        if intersects(ray, wall, ray=False):
-            return False
-    return True
+def _is_point_visible(pov, walls, belonging_wall, point, index=None):
+    return _are_points_visible(pov, walls, [belonging_wall], [point], index)[0]
+
+
+def _are_points_visible(pov, walls, belonging_walls, points, index=None):
+    """Batched `_is_point_visible`: one flag per (belonging_wall, point).
+
+    With a `spatial.WallGrid` over the walls as `index`, only the walls near
+    the rays are tested.
+    """
+    if not points:
+        return []
+    lines = [wall.line for wall in walls]
+    rays = [Line(pov, point) for point in points]
+    if index is None:
+        blocked = kernel.intersect(rays, lines, ray=False).mask
+    else:
+        candidates, hits = index.hits(rays)
+        lines = [lines[idx] for idx in candidates.tolist()]
+        blocked = hits.mask
+    ids = {}
+    line_ids = np.array([ids.setdefault(line, len(ids)) for line in lines])
+    own_ids = np.array([ids.get(wall, -1) for wall in belonging_walls])
+    blocked &= own_ids[:, None] != line_ids[None, :]
+    return (~blocked.any(axis=1)).tolist()
 
 
 def _mid_point(line):
     return Position((line.p1.x + line.p2.x) / 2, (line.p1.y + line.p2.y) / 2)
 
 
-def line_segments(pov, walls, visible=True):
+def line_segments(pov, walls, visible=True, arrangement=None):
     """Return all the line segments that are formed by the intersection points
        from the visible ray.
     """
-    point_collection = line_point_collection(pov, walls)
+    point_collection = line_point_collection(pov, walls, arrangement)
 
+    segments = []
     for wall, isects in point_collection.items():
         line = sorted(isects)
         for idx in range(len(line) - 1):
-            segment = Line(line[idx], line[idx + 1])
-            if visible:
-                if _is_point_visible(pov, walls, wall, _mid_point(segment)):
-                    yield segment
-            else:
-                yield segment
+            segments.append((wall, Line(line[idx], line[idx + 1])))
+
+    if not visible:
+        yield from (segment for _, segment in segments)
+        return
+
+    flags = _are_points_visible(
+        pov,
+        walls,
+        [wall for wall, _ in segments],
+        [_mid_point(segment) for _, segment in segments],
+        None if arrangement is None else arrangement.index,
+    )
+    for (_, segment), flag in zip(segments, flags):
+        if flag:
+            yield segment
 
 
 def crosses_wall(walls, ray):
-    for wall in walls:
-        if intersects(wall, ray, ray=False):
-            return wall
-    return None
+    if not walls:
+        return None
+    idx = kernel.first(kernel.intersect(walls, [ray], ray=False).mask[:, 0])
+    return None if idx is None else walls[idx]
@@ -1,66 +1,278 @@
+from collections import OrderedDict, namedtuple
+
+import numpy as np
 import pygame
-from .geometry import Line, intersects
-from .geometry import line_segments
+from .visibility import visibility_polygon
 from .sprites import floor as floor_img
+from .stats import COUNTS, STAGES, frame_stats
+
 
+def draw_world(surface, world, now, flip=True, overlay=False):
+    """Draw `world` on `surface`, and update the display if `flip` is set.
 
-def draw_world(surface, world, now):
+    Only the parts of the display that changed since the last frame are
+    updated, see `DirtyRects`.  Returns the rectangles that changed, or None
+    if all of `surface` may have.
+    """
     player = world.player
-    walls = world.walls
 
-    surface.fill((0, 0, 0))
-    bg = floor_img
-    bg_x, bg_y = bg.get_rect().size
-    for i in range(3):
-        for j in range(3):
-            surface.blit(bg, (bg_x * i, bg_y * j))
+    with frame_stats.stage("floor"):
+        static = static_layer.get(world)
+        surface.blit(static, (0, 0))
 
-    for wall in walls:
-        wall.draw(surface)
+    # the vision, the ghosts and the guard are drawn inverted, and subtracted
+    vision_surface = _scratch(world.size)
+    player.draw(vision_surface, world=world)
 
-    vision_surface = pygame.Surface(world.size.tup)
-    vision_surface.fill((20, 20, 20))
-    vision_surface.set_alpha(100)
+    with frame_stats.stage("blend"):
+        surface.blit(vision_surface, (0, 0), None, pygame.BLEND_RGB_SUB)
 
-    player.draw(vision_surface, world=world)
+    for explosion in world.explosions:
+        dirty.add(explosion.draw(surface, now))
 
-    # invert vision polygon
-    pixels = pygame.surfarray.pixels2d(vision_surface)
-    pixels ^= 2 ** 32 - 1
-    del pixels
+    if overlay:
+        dirty.add(draw_stats(surface, frame_stats))
 
-    surface.blit(vision_surface, (0, 0), None, pygame.BLEND_RGB_SUB)
+    key = (surface, static, vision_cache.get(world), dead_ghosts.get(world))
+    rects = dirty.flush(key)
+    if flip:
+        with frame_stats.stage("flip"):
+            if rects is None:
+                pygame.display.flip()
+            else:
+                pygame.display.update(rects)
+    return rects
 
-    for explosion in world.explosions:
-        explosion.draw(surface, now)
 
-    pygame.display.flip()
+_scratch_surface = None
+
+
+def _scratch(size):
+    """The surface the vision is drawn on, kept from frame to frame: blits
+    from run-length encoded layers onto a new surface would encode them anew.
+    """
+    global _scratch_surface
+    if _scratch_surface is None or _scratch_surface.get_size() != size.tup:
+        _scratch_surface = pygame.Surface(size.tup)
+    return _scratch_surface
+
+
+class StaticLayer:
+    """The floor and the walls, drawn once per level."""
+
+    def __init__(self):
+        self._walls = None
+        self._surface = None
+
+    def get(self, world):
+        surface = self._surface
+        if (
+            self._walls is world.walls
+            and surface is not None
+            and surface.get_size() == world.size.tup
+        ):
+            return surface
+
+        surface = pygame.Surface(world.size.tup)
+        surface.fill((0, 0, 0))
+        bg = floor_img
+        bg_x, bg_y = bg.get_rect().size
+        for i in range(3):
+            for j in range(3):
+                surface.blit(bg, (bg_x * i, bg_y * j))
+        for wall in world.walls:
+            wall.draw(surface)
+        self._walls, self._surface = world.walls, surface
+        return surface
+
+
+static_layer = StaticLayer()
+
+
+class DeadGhosts:
+    """The dead ghosts, which never move again, drawn inverted on one
+    transparent, run-length encoded, layer, redrawn only when a ghost dies.
+    """
+
+    def __init__(self):
+        self._pos = None
+        self._surface = None
+
+    def get(self, world):
+        ghosts = world.ghosts
+        pos = ghosts.pos[ghosts.dead]
+        surface = self._surface
+        if (
+            surface is not None
+            and surface.get_size() == world.size.tup
+            and np.array_equal(pos, self._pos)
+        ):
+            return surface
+
+        surface = pygame.Surface(world.size.tup, pygame.SRCALPHA)
+        surface.fill((0, 0, 0, 0))
+        surface.blits(ghosts.sprites(ghosts.dead, inverted=True), doreturn=False)
+        surface.set_alpha(255, pygame.RLEACCEL)
+        self._pos, self._surface = pos, surface
+        return surface
+
+
+dead_ghosts = DeadGhosts()
+
+
+class DirtyRects:
+    """The parts of the screen that changed since the last frame.
+
+    What is drawn every frame at a new place (live ghosts, explosions, the
+    overlay) is `add`ed while drawing.  Everything else only changes with
+    the layers it is drawn from, so as long as those are the same objects
+    as in the last frame, only the rectangles added in this frame and in the
+    last need to go to the display.
+    """
+
+    def __init__(self):
+        self._key = None
+        self._last = []
+        self._rects = []
+
+    def add(self, rect):
+        if rect is not None:
+            self._rects.append(rect)
+
+    def flush(self, key):
+        """End the frame drawn from the layers `key`, and return the
+        rectangles to update, or None if all of the screen changed.
+        """
+        rects, self._rects = self._rects, []
+        changed = None
+        if len(key) == len(self._key or ()) and all(
+            a is b for a, b in zip(key, self._key)
+        ):
+            changed = self._last + rects
+        self._key, self._last = key, rects
+        return changed
+
+
+dirty = DirtyRects()
+
+
+_font = None
+
+
+def draw_stats(surface, stats):
+    """Draw the median, 95th and 99th percentile of every stage of the last
+    frames of `stats`, in milliseconds, and of the counts.
+    """
+    global _font
+    if _font is None:
+        pygame.font.init()
+        _font = pygame.font.Font(None, 18)
+    percentiles = stats.percentiles((50, 95, 99))
+    rows = [("{} frames".format(len(stats)), "p50", "p95", "p99")]
+    for stage in STAGES:
+        ms = [1000 * value for value in percentiles[stage + "_s"]]
+        rows.append((stage + " ms",) + tuple("{:.2f}".format(v) for v in ms))
+    for name in COUNTS:
+        rows.append((name,) + tuple("{:.0f}".format(v) for v in percentiles[name]))
+    rect = pygame.Rect(5, 5, 270, 10 + 16 * len(rows))
+    surface.fill((0, 0, 0), rect)
+    for row, cells in enumerate(rows):
+        y = 10 + 16 * row
+        surface.blit(_font.render(cells[0], True, (255, 255, 0)), (10, y))
+        for col, cell in enumerate(cells[1:]):
+            text = _font.render(cell, True, (255, 255, 0))
+            surface.blit(text, (170 + 50 * col - text.get_width(), y))
+    return rect
+
+
+Vision = namedtuple("Vision", "polygon, mask, arrangement")
+
+
+class VisionCache:
+    """Bounded LRU of the guard's vision.
+
+    Keyed on the point of view and the identity of the wall arrangement, so
+    as long as the guard stands still the visibility polygon and the rendered
+    mask are reused rather than recomputed.
+    """
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, world):
+        pov = world.player.pos
+        arrangement = world.arrangement
+        key = (pov.tup, id(arrangement), world.size.tup)
+        vision = self._entries.get(key)
+        if vision is not None and vision.arrangement is arrangement:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vision
+
+        self.misses += 1
+        pieces = world.near(pov).pieces
+        frame_stats.count("walls_tested", len(pieces))
+        polygon = visibility_polygon(pov, pieces, split=False)
+        mask = _render_vision(world.size, polygon)
+        vision = Vision(polygon, mask, arrangement)
+        self._entries[key] = vision
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return vision
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+vision_cache = VisionCache()
+
+
+def _render_vision(size, polygon):
+    """Render the inverted vision mask: the visibility polygon in black, the
+    shadow in the inverse of the dark grey it is dimmed by.
+    """
+    mask = pygame.Surface(size.tup)
+    mask.fill((235, 235, 235))
+    if len(polygon) >= 3:
+        pygame.draw.polygon(mask, (0, 0, 0), [p.tup for p in polygon])
+    return mask
+
+
+def inverted(sprite):
+    """Return a copy of `sprite` with its colors inverted and its
+    transparency kept: blended over an inverted background, it gives the
+    inverse of `sprite` blended over the background.
+    """
+    sprite = sprite.copy()
+    rgb = pygame.surfarray.pixels3d(sprite)
+    rgb ^= 255
+    del rgb
+    return sprite
 
 
 def draw_vision(surface, world):
-    player = world.player
-    walls = world.walls
-    for segment in line_segments(player.pos, walls):
-        triangle = player.pos.tup, segment.p1.tup, segment.p2.tup
-        pygame.draw.polygon(surface, (255, 255, 255), triangle)
-        # the following lines (literally) are to pad between juxtaposed polygons
-        pygame.draw.line(surface, (255, 255, 255), player.pos.tup, segment.p1.tup, 2)
-        pygame.draw.line(surface, (255, 255, 255), player.pos.tup, segment.p2.tup, 2)
+    """Draw the inverted vision mask over all of `surface`."""
+    with frame_stats.stage("vision"):
+        vision = vision_cache.get(world)
+        surface.blit(vision.mask, (0, 0))
+    frame_stats.count("segments", len(vision.polygon))
 
 
 def draw_ghosts(surface, world):
-    """Draw all ghosts within view."""
-    pos = world.player
-    walls = world.walls
-    for ghost in world.ghosts:
-        if ghost.is_dead:
-            # I see dead ghosts
-            surface.blit(ghost.sprite, (ghost.pos - ghost.size / 2).tup)
-            continue
-
-        line = Line(pos.pos, ghost.pos)
-        for wall in walls:
-            if intersects(line, wall, ray=False):
-                break
-        else:
-            surface.blit(ghost.sprite, (ghost.pos - ghost.size / 2).tup)
+    """Draw all ghosts within view, and all dead ghosts, inverted."""
+    with frame_stats.stage("ghosts"):
+        surface.blit(dead_ghosts.get(world), (0, 0))
+        ghosts = world.ghosts
+        alive = ~ghosts.dead
+        shown = np.zeros(len(ghosts), dtype=bool)
+        shown[alive] = world.sees(ghosts.pos[alive])
+        sprites = ghosts.sprites(shown, inverted=True)
+        for rect in surface.blits(sprites):
+            dirty.add(rect)
+    frame_stats.count("ghosts_drawn", len(sprites))
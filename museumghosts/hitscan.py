@@ -0,0 +1,119 @@
+"""Hitscan shots.
+
+A shot travels along a segment and stops at the first thing it hits, a wall
+or a ghost.  Walls are found through the spatial index of the arrangement,
+ghosts are tested as axis aligned boxes with the slab method, all rays of a
+burst against all live ghosts in one NumPy call.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from . import kernel
+from .geometry import Position
+
+# half the side of the box a shot must pass through to hit a ghost
+HITBOX = 24
+
+Hit = namedtuple("Hit", "distance, point, wall, ghost")
+Hit.__doc__ = """Where a shot stopped.
+
+`distance` is measured from the start of the ray.  Exactly one of `wall`
+(the `Wall` hit) and `ghost` (the row of the ghost hit in the `GhostStore`)
+is not None.
+"""
+
+
+def _slabs(rays, boxes):
+    """Parameter along each ray where it enters each box, or inf if it misses.
+
+    `rays` is (R, 4) and `boxes` is (G, 4), rows ``x0, y0, x1, y1``; the
+    result is (R, G).  A ray starting inside a box enters it at 0.  Like
+    `kernel.intersect`, (..., R, 4) and (..., G, 4) give (..., R, G).
+    """
+    batch = np.broadcast_shapes(rays.shape[:-2], boxes.shape[:-2])
+    shape = batch + (rays.shape[-2], boxes.shape[-2])
+    enter = np.zeros(shape)
+    leave = np.ones(shape)
+    for axis in (0, 1):
+        origin = rays[..., :, axis, None]
+        delta = rays[..., axis + 2] - rays[..., axis]
+        lo, hi = boxes[..., None, :, axis], boxes[..., None, :, axis + 2]
+        moving = delta != 0
+        inv = 1 / np.where(moving, delta, 1)[..., None]
+        near = (lo - origin) * inv
+        far = (hi - origin) * inv
+        first = np.minimum(near, far)
+        last = np.maximum(near, far)
+        if not moving.all():
+            # a ray parallel to a slab is inside it everywhere or nowhere
+            outside = (origin < lo) | (hi < origin)
+            still = ~moving[..., None]
+            first = np.where(still, np.where(outside, np.inf, -np.inf), first)
+            last = np.where(still, np.where(outside, -np.inf, np.inf), last)
+        np.maximum(enter, first, out=enter)
+        np.minimum(leave, last, out=leave)
+    return np.where(enter <= leave, enter, np.inf)
+
+
+def _wall_hits(index, rays):
+    """Parameter and wall index of the first wall along each ray."""
+    t = np.full(len(rays), np.inf)
+    wall = np.full(len(rays), -1)
+    if not len(rays):
+        return t, wall
+    candidates, hits = index.hits(rays.reshape(-1, 2, 2).tolist())
+    if not len(candidates):
+        return t, wall
+    along = np.where(hits.mask, hits.t, np.inf)
+    nearest = along.argmin(axis=1)
+    t = along[np.arange(len(rays)), nearest]
+    wall = np.where(np.isfinite(t), candidates[nearest], -1)
+    return t, wall
+
+
+def _ghost_hits(ghosts, rays, chunk=256):
+    """Parameter and store row of the first live ghost along each ray."""
+    t = np.full(len(rays), np.inf)
+    ghost = np.full(len(rays), -1)
+    alive = np.flatnonzero(~ghosts.dead)
+    if not len(alive) or not len(rays):
+        return t, ghost
+    pos = ghosts.pos[alive]
+    boxes = np.hstack([pos - HITBOX, pos + HITBOX])
+    for start in range(0, len(rays), chunk):
+        rows = slice(start, start + chunk)
+        enter = _slabs(rays[rows], boxes)
+        nearest = enter.argmin(axis=1)
+        t[rows] = enter[np.arange(len(enter)), nearest]
+        ghost[rows] = np.where(np.isfinite(t[rows]), alive[nearest], -1)
+    return t, ghost
+
+
+def scan(world, rays):
+    """Shoot every ray in `rays` and return a `Hit` or None for each.
+
+    The rays are segments (`Line`s or an (R, 4) array), all shot at the
+    world as it is, so several rays may hit the same ghost.
+    """
+    rays = kernel.segments(rays)
+    index = world.arrangement.index
+    wall_t, wall = _wall_hits(index, rays)
+    ghost_t, ghost = _ghost_hits(world.ghosts, rays)
+    lengths = np.hypot(rays[:, 2] - rays[:, 0], rays[:, 3] - rays[:, 1])
+
+    result = []
+    for r in range(len(rays)):
+        if ghost[r] >= 0 and ghost_t[r] <= wall_t[r]:
+            t, target = ghost_t[r], None
+        elif wall[r] >= 0:
+            t, target = wall_t[r], index.walls[wall[r]]
+        else:
+            result.append(None)
+            continue
+        x1, y1, x2, y2 = rays[r].tolist()
+        point = Position(x1 + t * (x2 - x1), y1 + t * (y2 - y1))
+        row = int(ghost[r]) if target is None else None
+        result.append(Hit(float(t * lengths[r]), point, target, row))
+    return result
@@ -0,0 +1,96 @@
+"""Batched segment intersection.
+
+The scalar `geometry.intersects` tests one pair of lines at a time.  The
+functions here take whole arrays of segments, one row ``x1, y1, x2, y2`` per
+segment, and test every segment in one array against every segment in the
+other in a single NumPy call.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+Hits = namedtuple("Hits", "mask, t, u, points")
+
+
+def segments(lines, out=None):
+    """Return an (N, 4) float array of ``x1, y1, x2, y2`` rows.
+
+    Accepts an existing array (returned as is), or an iterable of `Line`s,
+    `Wall`s or nested coordinate tuples.  The rows are written to `out` if it
+    is given, so a hot loop can reuse one buffer.
+    """
+    if isinstance(lines, np.ndarray):
+        return lines
+    coords = []
+    for line in lines:
+        line = getattr(line, "line", line)
+        (x1, y1), (x2, y2) = line
+        coords += (x1, y1, x2, y2)
+    if out is None:
+        return np.array(coords, dtype=float).reshape(-1, 4)
+    out = out[: len(coords) // 4]
+    out.flat[:] = coords
+    return out
+
+
+def points(positions, out=None):
+    """Return an (N, 2) float array of ``x, y`` rows, written to `out` if it
+    is given.
+    """
+    coords = []
+    for x, y in positions:
+        coords += (x, y)
+    if out is None:
+        return np.array(coords, dtype=float).reshape(-1, 2)
+    out = out[: len(coords) // 2]
+    out.flat[:] = coords
+    return out
+
+
+def intersect(a, b, ray=False):
+    """Intersect every segment in `a` with every segment in `b`.
+
+    Follows the conventions of `geometry.intersects(line1, line2, ray)` with
+    `a` in the role of `line1` and `b` in the role of `line2`: ``t`` is the
+    parameter along `a` and must lie in [0, 1], ``u`` is the parameter along
+    `b` and must lie in [0, 1], or only be non-negative if `ray` is set.
+
+    Returns `Hits(mask, t, u, points)` where `mask`, `t` and `u` have shape
+    (len(a), len(b)) and `points` has shape (len(a), len(b), 2).  Entries
+    where the lines are parallel have `mask` False and `t`, `u` NaN.
+
+    Arrays with leading batch dimensions, (..., N, 4) and (..., M, 4),
+    intersect batch by batch into (..., N, M); segments of NaN meet nothing.
+    """
+    a = segments(a)
+    b = segments(b)
+    x1, y1, x2, y2 = (a[..., :, None, i] for i in range(4))
+    x3, y3, x4, y4 = (b[..., None, :, i] for i in range(4))
+
+    t_n = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
+    parallel = t_n == 0
+    t_n = np.where(parallel, np.nan, t_n)
+
+    t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / t_n
+    u = -((x1 - x2) * (y1 - y3) - (y1 - y2) * (x1 - x3)) / t_n
+
+    mask = (0 <= t) & (t <= 1) & (0 <= u)
+    if not ray:
+        mask &= u <= 1
+
+    points = np.empty(t.shape + (2,))
+    points[..., 0] = x1 + t * (x2 - x1)
+    points[..., 1] = y1 + t * (y2 - y1)
+    return Hits(mask, t, u, points)
+
+
+def crossing(a, b, ray=False):
+    """Return a boolean array telling which segments in `a` meet any in `b`."""
+    return intersect(a, b, ray=ray).mask.any(axis=1)
+
+
+def first(mask):
+    """Index of the first True entry of a 1-d mask, or None."""
+    idx = np.flatnonzero(mask)
+    return int(idx[0]) if len(idx) else None
@@ -25,6 +25,7 @@ https://github.com/norvig/pytudes
 """
 
 import random
+from array import array
 from collections import deque, namedtuple
 
 
@@ -62,8 +63,98 @@ def squares(width, height):
     return {(x, y) for x in range(width) for y in range(height)}
 
 
-def random_maze(width, height, pop=deque.pop):
-    """Use random_tree to generate a random maze."""
-    nodes = squares(width, height)
-    tree = random_tree(nodes, neighbors4, pop)
-    return Maze(width, height, tree)
+def random_maze(width, height, pop=deque.pop, seed=None):
+    """Use grid_tree to generate a random maze."""
+    return Maze(width, height, list(grid_tree(width, height, pop, seed)))
+
+
+class Frontier:
+    """The frontier of `grid_tree`: square numbers in a compact array, with
+    the part of the deque interface the `pop` functions use.
+    """
+
+    def __init__(self, typecode="I"):
+        self._items = array(typecode)
+        self._head = 0  # items before it have been popped from the left
+
+    def __len__(self):
+        return len(self._items) - self._head
+
+    def __getitem__(self, i):
+        return self._items[self._index(i)]
+
+    def __setitem__(self, i, value):
+        self._items[self._index(i)] = value
+
+    def _index(self, i):
+        if not -len(self) <= i < len(self):
+            raise IndexError("frontier index out of range")
+        return i + self._head if i >= 0 else len(self._items) + i
+
+    def extend(self, items):
+        self._items.extend(items)
+
+    def pop(self):
+        if not len(self):
+            raise IndexError("pop from an empty frontier")
+        return self._items.pop()
+
+    def popleft(self):
+        if not len(self):
+            raise IndexError("pop from an empty frontier")
+        item = self._items[self._head]
+        self._head += 1
+        if self._head * 2 > len(self._items):
+            del self._items[: self._head]
+            self._head = 0
+        return item
+
+
+def grid_tree(width, height, pop=deque.pop, seed=None):
+    """Generate the edges of a random spanning tree of the width x height
+    grid, one at a time, the way random_tree(squares(width, height),
+    neighbors4, pop) builds it.
+
+    The squares are numbered, marked in a bytearray and kept in a compact
+    `Frontier`, a few bytes per square instead of a set of tuples, so grids
+    of tens of millions of squares fit in memory; the edges are streamed out
+    as they are found.  deque.pop and deque.popleft are mapped to the
+    Frontier's, and any other `pop` is called with the Frontier.  The choices
+    are drawn from random.Random(seed), or from the random module if `seed`
+    is None.
+    """
+    rng = random if seed is None else random.Random(seed)
+    pop = {deque.pop: Frontier.pop, deque.popleft: Frontier.popleft}.get(pop, pop)
+    size = width * height
+    if size == 0:
+        return
+    added = bytearray(size)
+    root = rng.randrange(size)
+    added[root] = 1
+    frontier = Frontier("I" if size < 2 ** 32 else "Q")
+    frontier.extend((root,))
+    remaining = size - 1
+    nbrs = [0, 0, 0, 0]
+    while remaining:
+        node = pop(frontier)
+        y, x = divmod(node, width)
+        count = 0
+        if x + 1 < width and not added[node + 1]:
+            nbrs[count] = node + 1
+            count += 1
+        if x > 0 and not added[node - 1]:
+            nbrs[count] = node - 1
+            count += 1
+        if y + 1 < height and not added[node + width]:
+            nbrs[count] = node + width
+            count += 1
+        if y > 0 and not added[node - width]:
+            nbrs[count] = node - width
+            count += 1
+        if count:
+            nbr = nbrs[int(rng.random() * count)]
+            added[nbr] = 1
+            remaining -= 1
+            frontier.extend((node, nbr))
+            y2, x2 = divmod(nbr, width)
+            yield Edge((x, y), (x2, y2))
@@ -1,5 +1,14 @@
 import itertools
-from .geometry import intersects, Line, Position, line_segments
+import multiprocessing
+import sys
+from collections import namedtuple
+
+import numpy as np
+
+from . import kernel
+from .arrangement import Arrangement, Neighbourhood
+from .geometry import Line, Position
+from .visibility import visible_segments
 
 
 def _rect_line_iterator(rect):
@@ -21,8 +30,7 @@ def _points_in_lines(lines):
 
 
 def _vertex_iterator(world):
-    for wall in world.walls:
-        yield from wall.line
+    yield from world.arrangement.endpoints
 
 
 def _pair_iterator(world):
@@ -36,16 +44,16 @@ def _preprocess_rect(world, upperleft, lowerright):
 
     """
     EPSILON = Position(0.01, 0.01)
-    x1, y1 = upperleft
-    x2, y2 = lowerright
-    rect_lines = _rect_line_iterator((upperleft, lowerright))
+    rect_lines = list(_rect_line_iterator((upperleft, lowerright)))
     point_collection = set(_points_in_lines(rect_lines))
-    for p1, p2 in _pair_iterator(world):
-        for rect_edge in rect_lines:
-            point = intersects(Line(p1, p2), rect_edge, ray=True)
-            if point:
-                point_collection.add(point + EPSILON)
-                point_collection.add(point - EPSILON)
+    pairs = [Line(p1, p2) for p1, p2 in _pair_iterator(world) if p1 != p2]
+    if not pairs:
+        return point_collection
+    hits = kernel.intersect(pairs, rect_lines, ray=True)
+    for x, y in hits.points[hits.mask].tolist():
+        point = Position(x, y)
+        point_collection.add(point + EPSILON)
+        point_collection.add(point - EPSILON)
 
     return point_collection
 
@@ -71,40 +79,184 @@ def _visible_walls(world, rect, point_collection):
 
        Also includes any wall that crosses the rect boundary.
     """
+    walls = world.arrangement.walls
+    indices = _visible_wall_indices(world, rect, point_collection)
+    return set(walls[idx] for idx in indices)
+
 
-    visible = set()
+def _visible_wall_indices(world, rect, point_collection):
+    arrangement = world.arrangement
+    walls = arrangement.segments
+    visible = np.zeros(len(walls), dtype=bool)
 
     # first all the visible walls
     for p in point_collection:
-        # for wall in world.walls:
-        segs = line_segments(p, world.walls, visible=True)
-        for wall in world.walls:
-            for seg in segs:
-                p1, p2 = seg
-                if intersects(
-                    wall,
-                    Line(p1 + Position(0.01, 0.01), p2 - Position(0.01, 0.01)),
-                    ray=False,
-                ):
-                    visible.add(wall)
+        segs = [
+            Line(p1 + Position(0.01, 0.01), p2 - Position(0.01, 0.01))
+            for p1, p2 in visible_segments(p, arrangement.pieces, split=False)
+        ]
+        if segs:
+            visible |= kernel.crossing(walls, segs)
 
     # all walls intersecting the rect
-    for wall in world.walls:
-        for line in _rect_line_iterator(rect):
-            if intersects(wall, line, ray=False):
-                visible.add(wall)
+    visible |= kernel.crossing(walls, list(_rect_line_iterator(rect)))
+
+    return np.flatnonzero(visible).tolist()
+
+
+def _preprocess_cell(world, rect):
+    point_collection = _preprocess_rect(world, *rect)
+    return _visible_wall_indices(world, rect, point_collection)
+
+
+# The walls as seen by a worker process: just enough of a World for
+# _preprocess_cell, rebuilt from the wall array shipped by _init_worker.
+_WorkerWorld = namedtuple("_WorkerWorld", "arrangement")
+_worker_world = None
 
-    return visible
 
+def _init_worker(segments):
+    global _worker_world
+    lines = [
+        Line(Position(x1, y1), Position(x2, y2))
+        for x1, y1, x2, y2 in segments.tolist()
+    ]
+    _worker_world = _WorkerWorld(Arrangement(lines))
 
-def preprocess(world):
+
+def _work(job):
+    idx, rect = job
+    return idx, _preprocess_cell(_worker_world, rect)
+
+
+def _print_progress(done, total):
+    sys.stderr.write("\rpreprocessing {}/{} cells".format(done, total))
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def preprocess(world, cellsize=100, processes=1, progress=None):
     """Returns a dict from rectangles to a set of walls that are
        potentially visible from somewhere in the rect.
+
+       With `processes` other than 1 the cells are shared out over that
+       many worker processes (all cores if None), which only get the
+       wall coordinates.  `progress` is called as progress(done, total)
+       after every cell, or prints to stderr if True.
     """
-    visible_walls = {}
-    for rect in _gen_rects(world.size):
-        point_collection = _preprocess_rect(world, *rect)
-        visible_walls[(rect.p1, rect.p2)] = _visible_walls(
-            world, rect, point_collection
+    if progress is True:
+        progress = _print_progress
+    rects = list(_gen_rects(world.size, cellsize))
+    walls = world.arrangement.walls
+    cells = [None] * len(rects)
+
+    if processes == 1:
+        results = (
+            (idx, _preprocess_cell(world, rect)) for idx, rect in enumerate(rects)
         )
+        _collect(results, cells, progress)
+    else:
+        with multiprocessing.Pool(
+            processes, _init_worker, (world.arrangement.segments,)
+        ) as pool:
+            results = pool.imap_unordered(_work, enumerate(rects))
+            _collect(results, cells, progress)
+
+    visible_walls = {}
+    for rect, indices in zip(rects, cells):
+        visible_walls[(rect.p1, rect.p2)] = set(walls[idx] for idx in indices)
     return visible_walls
+
+
+def _collect(results, cells, progress):
+    for done, (idx, indices) in enumerate(results, 1):
+        cells[idx] = indices
+        if progress:
+            progress(done, len(cells))
+
+
+class PVS:
+    """The potentially visible walls of every grid cell of a world.
+
+    Wraps the dict returned by `preprocess` with an O(1) lookup from a
+    position to the `Neighbourhood` (walls, wall array and wall pieces) of
+    the cell containing it.  The wall indices of cell (i, j) are stored as
+    ``indices[offsets[k]:offsets[k + 1]]`` with ``k = i * shape[1] + j``.
+    """
+
+    def __init__(self, visible_walls, arrangement, cellsize=100):
+        index = {}
+        for idx, wall in enumerate(arrangement.walls):
+            index.setdefault(wall, idx)
+        cells = {}
+        for (upperleft, _), walls in visible_walls.items():
+            cell = _cell(upperleft, cellsize)
+            cells[cell] = sorted(index[wall] for wall in walls)
+        nx = 1 + max((i for i, _ in cells), default=-1)
+        ny = 1 + max((j for _, j in cells), default=-1)
+        offsets = [0]
+        indices = []
+        for i in range(nx):
+            for j in range(ny):
+                indices += cells.get((i, j), [])
+                offsets.append(len(indices))
+        self._setup(
+            arrangement,
+            cellsize,
+            (nx, ny),
+            np.array(offsets, dtype=np.int64),
+            np.array(indices, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_arrays(cls, arrangement, cellsize, shape, offsets, indices):
+        pvs = cls.__new__(cls)
+        pvs._setup(arrangement, cellsize, shape, offsets, indices)
+        return pvs
+
+    def _setup(self, arrangement, cellsize, shape, offsets, indices):
+        self.arrangement = arrangement
+        self.cellsize = cellsize
+        self.shape = tuple(shape)
+        self.offsets = offsets
+        self.indices = indices
+        self._neighbourhoods = {}
+
+    @staticmethod
+    def from_world(world, cellsize=100, processes=1, progress=None):
+        visible_walls = preprocess(world, cellsize, processes, progress)
+        return PVS(visible_walls, world.arrangement, cellsize)
+
+    def cell(self, pos):
+        return _cell(pos, self.cellsize)
+
+    def __len__(self):
+        return self.shape[0] * self.shape[1]
+
+    def __contains__(self, pos):
+        i, j = self.cell(pos)
+        return 0 <= i < self.shape[0] and 0 <= j < self.shape[1]
+
+    def __getitem__(self, pos):
+        """The `Neighbourhood` of the cell containing `pos`."""
+        i, j = self.cell(pos)
+        k = i * self.shape[1] + j
+        if k not in self._neighbourhoods:
+            indices = self.indices[self.offsets[k] : self.offsets[k + 1]]
+            self._neighbourhoods[k] = self._neighbourhood(indices.tolist())
+        return self._neighbourhoods[k]
+
+    def _neighbourhood(self, indices):
+        arr = self.arrangement
+        walls = [arr.walls[idx] for idx in indices]
+        segments = arr.segments[np.array(indices, dtype=int)]
+        chosen = set(indices)
+        pieces = [
+            piece for piece, idx in zip(arr.pieces, arr.piece_walls) if idx in chosen
+        ]
+        return Neighbourhood(walls, segments, pieces)
+
+
+def _cell(pos, cellsize):
+    return int(pos.x // cellsize), int(pos.y // cellsize)
@@ -0,0 +1,205 @@
+"""Recorded games, and their replay.
+
+A recording holds what a game depends on: the seed of its random numbers,
+the level it was played on, and for every tick the time, the milliseconds
+since the previous tick, the movement keys held down and the input events.
+Replaying it runs the same game logic on the same input, so a recorded game
+is repeated exactly, as fast as it can be computed::
+
+    museumghosts --record game.mgr
+    museumghosts-replay game.mgr --draw
+
+The file is little-endian and append-only, written a tick at a time, so a
+game cut short leaves a readable recording of the ticks before::
+
+    header    see _HEADER, then the UTF-8 level path, empty for a maze
+    ticks     see _TICK, then the events of the tick, see _EVENT
+"""
+
+import argparse
+import json
+import struct
+import sys
+import time
+from collections import namedtuple
+
+import pygame
+
+from .stats import frame_stats
+
+MAGIC = b"MGHOSTRC"
+VERSION = 1
+
+# magic, version, seed, length of the level path
+_HEADER = struct.Struct("<8sIQH")
+# now (seconds), elapsed (milliseconds), movement keys (bit i for
+# game.MOVEMENT_KEYS[i]), number of events
+_TICK = struct.Struct("<dIBH")
+# event type, x or key, y or 0
+_EVENT = struct.Struct("<Bii")
+
+# the event types recorded, by code
+EVENT_TYPES = (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.KEYDOWN)
+_CODES = {type_: code for code, type_ in enumerate(EVENT_TYPES)}
+
+
+class RecordingError(ValueError):
+    pass
+
+
+Header = namedtuple("Header", "seed, level")
+Tick = namedtuple("Tick", "now, elapsed, keys, events")
+
+
+def event_fields(evt):
+    """Return the recorded fields of `evt`, (type, x or key, y or 0)."""
+    if evt.type == pygame.KEYDOWN:
+        return evt.type, evt.key, 0
+    return (evt.type,) + tuple(evt.pos)
+
+
+def _is_quit(evt, quit_keys):
+    return evt.type == pygame.KEYDOWN and evt.key in quit_keys
+
+
+def _event(type_, a, b):
+    if type_ == pygame.KEYDOWN:
+        return pygame.event.Event(type_, key=a)
+    return pygame.event.Event(type_, pos=(a, b))
+
+
+class Recorder:
+    """Append the ticks of a game to a new recording at `path`."""
+
+    def __init__(self, path, seed, level=None, movement_keys=()):
+        self.movement_keys = tuple(movement_keys)
+        level = (level or "").encode("utf-8")
+        self._file = open(path, "wb")
+        self._file.write(_HEADER.pack(MAGIC, VERSION, seed, len(level)) + level)
+
+    def tick(self, now, elapsed, keys, events):
+        """Record a tick: the time `now`, the `elapsed` milliseconds, the
+        movement `keys` held down and the `events` handled.
+        """
+        mask = 0
+        for bit, key in enumerate(self.movement_keys):
+            if key in keys:
+                mask |= 1 << bit
+        chunks = [_TICK.pack(now, elapsed, mask, len(events))]
+        for evt in events:
+            type_, a, b = event_fields(evt)
+            chunks.append(_EVENT.pack(_CODES[type_], a, b))
+        self._file.write(b"".join(chunks))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read(path, movement_keys=()):
+    """Return the `Header` of the recording at `path`, and an iterator over
+    its `Tick`s, with the events as pygame events.
+
+    A tick cut short at the end of the file is left out.
+    """
+    with open(path, "rb") as fin:
+        buf = fin.read()
+    if len(buf) < _HEADER.size:
+        raise RecordingError("not a recording: too short")
+    magic, version, seed, length = _HEADER.unpack_from(buf)
+    if magic != MAGIC:
+        raise RecordingError("not a recording: bad magic")
+    if version != VERSION:
+        raise RecordingError("unsupported recording version {}".format(version))
+    offset = _HEADER.size + length
+    level = buf[_HEADER.size : offset].decode("utf-8") or None
+
+    def ticks(offset):
+        while offset + _TICK.size <= len(buf):
+            now, elapsed, mask, count = _TICK.unpack_from(buf, offset)
+            end = offset + _TICK.size + count * _EVENT.size
+            if end > len(buf):
+                return
+            events = [
+                _event(EVENT_TYPES[code], a, b)
+                for code, a, b in _EVENT.iter_unpack(buf[offset + _TICK.size : end])
+            ]
+            keys = [key for bit, key in enumerate(movement_keys) if mask >> bit & 1]
+            yield Tick(now, elapsed, keys, events)
+            offset = end
+
+    return Header(seed, level), ticks(offset)
+
+
+Replay = namedtuple("Replay", "world, status, ticks")
+
+
+def replay(path, surface=None):
+    """Replay the recording at `path`, drawing every tick on `surface` if
+    given, and return a `Replay` of the final world, its status and the
+    number of ticks replayed.
+
+    The replay stops where the game did: when it is over, or at a quit key.
+    Like the game loop, every tick is recorded in `stats.frame_stats`.
+    """
+    from . import util
+    from .game import MOVEMENT_KEYS, QUIT_KEYS, _step, game_status, setup_game
+    from .graphics import draw_world
+
+    header, ticks = read(path, MOVEMENT_KEYS)
+    util.seed(header.seed)
+    now = 0.0
+    world = setup_game(level=header.level, clock=lambda: now)
+    count = 0
+    for tick in ticks:
+        if game_status(world) is not None:
+            break
+        if any(_is_quit(evt, QUIT_KEYS) for evt in tick.events):
+            break
+        now = tick.now
+        frame_stats.begin()
+        with frame_stats.stage("update"):
+            world = _step(world, now, tick.elapsed, tick.events, tick.keys)
+        if surface is not None:
+            draw_world(surface, world, now=now, flip=False)
+        frame_stats.end()
+        count += 1
+    return Replay(world, game_status(world), count)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="museumghosts-replay",
+        description="Replay a recorded game as fast as possible, and time it.",
+    )
+    parser.add_argument("path")
+    parser.add_argument("--draw", action="store_true", help="render every tick")
+    args = parser.parse_args(argv)
+
+    surface = None
+    if args.draw:
+        from .game import SIZE
+
+        surface = pygame.Surface(SIZE.tup)
+    start = time.perf_counter()
+    result = replay(args.path, surface)
+    seconds = time.perf_counter() - start
+    report = {
+        "ticks": result.ticks,
+        "seconds": seconds,
+        "ticks_per_second": result.ticks / seconds if seconds else None,
+        "status": result.status,
+        "ghosts": len(result.world.ghosts),
+        # of the last frame_stats.maxlen ticks
+        "percentiles": frame_stats.percentiles(),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
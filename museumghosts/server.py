@@ -0,0 +1,307 @@
+"""Many games in one process, served over a socket.
+
+The `Server` hosts any number of sessions, each a headless `Engine` on a
+fixed time step, and ticks them all from one asyncio task: every session
+is stepped when its next tick is due, in order of the deadlines.  Clients
+talk to it in JSON, one object per line, a response line per request::
+
+    {"op": "new", "seed": 42}                         -> {"session": 1}
+    {"op": "input", "session": 1, "keys": "wd", "vision": [900, 350],
+     "fire": true}                                     -> {}
+    {"op": "state", "session": 1}                      -> {"tick": 80, ...}
+    {"op": "stats"}                                    -> {"sessions": {...}}
+    {"op": "close", "session": 1}                      -> {}
+
+A failed request is answered with {"error": "..."}.  The input of a session
+holds until it is changed, except for a shot, which is fired at the next
+tick.  A session whose game is over is closed by the server `grace` seconds
+later, if the client has not closed it.  `LocalClient` makes the same
+requests in process, for tests and bots::
+
+    museumghosts-server --port 8765 --sessions 100
+"""
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import math
+import sys
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+from . import util
+from .engine import Engine, Input
+
+KEYS = {"w": pygame.K_w, "a": pygame.K_a, "s": pygame.K_s, "d": pygame.K_d}
+
+log = logging.getLogger(__name__)
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def _is_number(value):
+    return (
+        isinstance(value, (int, float))
+        and not isinstance(value, bool)
+        and math.isfinite(value)
+    )
+
+
+def _check_dt(dt):
+    if not _is_number(dt) or dt <= 0:
+        raise ProtocolError("dt must be a positive number, not {!r}".format(dt))
+    return dt
+
+
+class Session:
+    """A game of the server, its input and its tick latencies.
+
+    The latency of a tick is the time from when it was due to when it was
+    done, so it counts the waiting on other sessions as well as the tick.
+    A session whose tick raised is over, with the `failure`.  The game is
+    set up from `seed` without touching the random numbers of the process.
+    """
+
+    def __init__(self, id, seed=None, dt=0.02, maxlen=1000):
+        self.id = id
+        self.seed = seed
+        with util.seeded(seed):
+            self.engine = Engine(dt=dt)
+        self.input = Input()
+        self.latencies = deque(maxlen=maxlen)
+        self.failure = None
+        self.ended = None  # when the server saw the game over
+
+    def step(self, deadline, clock=time.monotonic):
+        inp = self.input
+        if inp.fire:
+            self.input = inp._replace(fire=False)
+        self.engine.step(inp)
+        self.latencies.append(clock() - deadline)
+
+    @property
+    def over(self):
+        return self.failure is not None or self.engine.status is not None
+
+    def state(self):
+        world = self.engine.world
+        return {
+            "session": self.id,
+            "tick": self.engine.ticks,
+            "time": self.engine.clock(),
+            "status": self.engine.status,
+            "failure": self.failure,
+            "player": list(world.player.pos),
+            "vision": list(world.player.vision),
+            "ghosts": world.ghosts.num_alive,
+            "dead": world.ghosts.num_dead,
+        }
+
+    def stats(self, qs=(50, 99)):
+        """The tick count and the latency percentiles `qs`, in seconds."""
+        latencies = np.array(self.latencies)
+        values = np.percentile(latencies, qs).tolist() if len(latencies) else []
+        return {
+            "ticks": self.engine.ticks,
+            "latency": dict(zip(("p{}".format(q) for q in qs), values)),
+        }
+
+
+class Server:
+    """Host sessions, and tick them on `clock` as they fall due; close
+    the sessions `grace` seconds after their game is over.
+    """
+
+    def __init__(self, dt=0.02, clock=time.monotonic, grace=60.0):
+        self.dt = _check_dt(dt)
+        self.clock = clock
+        self.grace = grace
+        self.sessions = {}
+        self._ids = itertools.count(1)
+        self._due = []  # (deadline, session id), a heap
+        self._wakeup = None
+
+    def create(self, seed=None, dt=None):
+        """Start a session, ticking from now on, and return it."""
+        dt = self.dt if dt is None else _check_dt(dt)
+        session = Session(next(self._ids), seed, dt)
+        self.sessions[session.id] = session
+        heapq.heappush(self._due, (self.clock() + session.engine.dt, session.id))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return session
+
+    def close(self, id):
+        del self.sessions[id]  # its deadline is dropped when due
+
+    def advance(self, now=None):
+        """Step every session whose tick is due by `now`, as often as it is
+        due, and return the number of ticks played.
+
+        A session whose tick raises is logged and stopped, with the failure in
+        its state; the other sessions play on.  A session over is closed once
+        its grace period is.
+        """
+        now = self.clock() if now is None else now
+        due = self._due
+        played = 0
+        while due and due[0][0] <= now:
+            deadline, id = heapq.heappop(due)
+            session = self.sessions.get(id)
+            if session is None:
+                continue
+            if session.over:
+                if session.ended is None:
+                    session.ended = now
+                    heapq.heappush(due, (now + self.grace, id))
+                elif now >= session.ended + self.grace:
+                    self.close(id)
+                continue
+            try:
+                session.step(deadline, self.clock)
+                played += 1
+            except Exception as exc:
+                log.exception("session %s stopped", id)
+                session.failure = "{}: {}".format(type(exc).__name__, exc)
+            dt = session.engine.dt
+            # a session far behind skips ahead rather than catching up
+            heapq.heappush(due, (max(deadline + dt, now - 4 * dt), id))
+        return played
+
+    async def run(self):
+        """Tick the sessions, forever."""
+        self._wakeup = asyncio.Event()
+        while True:
+            self.advance()
+            self._wakeup.clear()
+            timeout = self._due[0][0] - self.clock() if self._due else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def handle(self, request):
+        """Answer `request`, a dict of the protocol, with a dict."""
+        try:
+            return self._handle(request)
+        except (KeyError, TypeError, ValueError) as exc:
+            return {"error": "{}: {}".format(type(exc).__name__, exc)}
+
+    def _session(self, request):
+        id = request["session"]
+        if id not in self.sessions:
+            raise ProtocolError("no session {}".format(id))
+        return self.sessions[id]
+
+    def _handle(self, request):
+        op = request["op"]
+        if op == "new":
+            return {"session": self.create(request.get("seed"), request.get("dt")).id}
+        if op == "input":
+            session = self._session(request)
+            inp = session.input
+            if "keys" in request:
+                keys = request["keys"]
+                if not isinstance(keys, str) or not set(keys) <= set(KEYS):
+                    raise ProtocolError("keys must be a string of wasd")
+                inp = inp._replace(keys=tuple(KEYS[key] for key in keys))
+            vision = request.get("vision")
+            if vision is not None:
+                if not (
+                    isinstance(vision, list)
+                    and len(vision) == 2
+                    and all(map(_is_number, vision))
+                ):
+                    raise ProtocolError("vision must be two numbers [x, y]")
+                inp = inp._replace(vision=tuple(vision))
+            if request.get("fire"):
+                inp = inp._replace(fire=True)
+            session.input = inp
+            return {}
+        if op == "state":
+            return self._session(request).state()
+        if op == "stats":
+            return {
+                "sessions": {
+                    str(id): session.stats() for id, session in self.sessions.items()
+                }
+            }
+        if op == "close":
+            self.close(self._session(request).id)
+            return {}
+        raise ProtocolError("unknown op {!r}".format(op))
+
+    async def _serve_client(self, reader, writer):
+        try:
+            async for line in reader:
+                try:
+                    response = self.handle(json.loads(line))
+                except json.JSONDecodeError as exc:
+                    response = {"error": "JSONDecodeError: {}".format(exc)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """Accept clients on `host`:`port` and tick the sessions, forever."""
+        server = await asyncio.start_server(self._serve_client, host, port)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.run())
+
+
+class LocalClient:
+    """A client of `server` in the same process, speaking the protocol
+    without the socket; the requests and responses go through JSON all the
+    same.
+    """
+
+    def __init__(self, server):
+        self.server = server
+
+    async def request(self, op, **fields):
+        request = json.loads(json.dumps(dict(fields, op=op)))
+        await asyncio.sleep(0)  # as a socket would, let the server run
+        response = json.loads(json.dumps(self.server.handle(request)))
+        if "error" in response:
+            raise ProtocolError(response["error"])
+        return response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="museumghosts-server", description="Host many headless games."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dt", type=float, default=0.02, help="seconds per tick")
+    parser.add_argument(
+        "--sessions", type=int, default=0, help="sessions to start with, seeds 0.."
+    )
+    parser.add_argument(
+        "--grace",
+        type=float,
+        default=60.0,
+        help="seconds a session is kept after its game is over",
+    )
+    args = parser.parse_args(argv)
+
+    server = Server(dt=args.dt, grace=args.grace)
+    for seed in range(args.sessions):
+        server.create(seed)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,245 @@
+"""Spatial index over the walls.
+
+`WallGrid` buckets the walls into a uniform grid.  A segment query walks the
+grid cells the segment passes through (a DDA traversal, as in Amanatides and
+Woo's voxel walk), collects the walls bucketed there and tests only those,
+so a query costs in proportion to the walls near the segment rather than to
+all walls.
+"""
+
+import math
+
+import numpy as np
+
+from . import kernel
+from .geometry import Position
+
+
+def _clips(x1, y1, x2, y2, rect):
+    """Does the segment meet the closed rectangle ``(x0, y0, x1, y1)``?
+
+    Liang-Barsky clipping: shrink the parameter interval [0, 1] of the
+    segment to the part between each pair of rectangle sides.
+    """
+    rx0, ry0, rx1, ry1 = rect
+    lo, hi = 0.0, 1.0
+    for p, q in (
+        (x1 - x2, x1 - rx0),
+        (x2 - x1, rx1 - x1),
+        (y1 - y2, y1 - ry0),
+        (y2 - y1, ry1 - y1),
+    ):
+        if p == 0:
+            if q < 0:
+                return False
+            continue
+        r = q / p
+        if p < 0:
+            lo = max(lo, r)
+        else:
+            hi = min(hi, r)
+        if lo > hi:
+            return False
+    return True
+
+
+class WallGrid:
+    """Uniform grid of buckets of wall indices.
+
+    A wall is put in the bucket of every cell whose closed rectangle it
+    meets, so a wall on a cell border is found from both sides.
+    """
+
+    def __init__(self, walls, segments=None, cellsize=50):
+        self.walls = list(walls)
+        self.segments = kernel.segments(self.walls) if segments is None else segments
+        self.cellsize = cellsize
+        buckets = {}
+        for idx, (x1, y1, x2, y2) in enumerate(self.segments.tolist()):
+            for cell in self._cells_near(x1, y1, x2, y2):
+                buckets.setdefault(cell, []).append(idx)
+        self._buckets = {
+            cell: np.array(indices, dtype=np.int64) for cell, indices in buckets.items()
+        }
+
+    def _cells_near(self, x1, y1, x2, y2):
+        cs = self.cellsize
+        i0 = math.ceil(min(x1, x2) / cs) - 1
+        i1 = math.floor(max(x1, x2) / cs)
+        j0 = math.ceil(min(y1, y2) / cs) - 1
+        j1 = math.floor(max(y1, y2) / cs)
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                rect = (i * cs, j * cs, (i + 1) * cs, (j + 1) * cs)
+                if _clips(x1, y1, x2, y2, rect):
+                    yield i, j
+
+    def traverse(self, line):
+        """Yield the cells `line` passes through, from `line.p1` to `line.p2`."""
+        cs = self.cellsize
+        (x1, y1), (x2, y2) = line
+        i, j = math.floor(x1 / cs), math.floor(y1 / cs)
+        iend, jend = math.floor(x2 / cs), math.floor(y2 / cs)
+        dx, dy = x2 - x1, y2 - y1
+        stepi = 1 if dx > 0 else -1
+        stepj = 1 if dy > 0 else -1
+        tmaxi = ((i + (dx > 0)) * cs - x1) / dx if dx else math.inf
+        tmaxj = ((j + (dy > 0)) * cs - y1) / dy if dy else math.inf
+        tdeltai = cs / abs(dx) if dx else math.inf
+        tdeltaj = cs / abs(dy) if dy else math.inf
+
+        yield i, j
+        for _ in range(abs(iend - i) + abs(jend - j)):
+            if tmaxi < tmaxj:
+                i += stepi
+                tmaxi += tdeltai
+            else:
+                j += stepj
+                tmaxj += tdeltaj
+            yield i, j
+
+    def candidates(self, lines):
+        """Indices of the walls bucketed in the cells along any of `lines`."""
+        found = []
+        seen = set()
+        for line in lines:
+            for cell in self.traverse(line):
+                if cell in seen:
+                    continue
+                seen.add(cell)
+                if cell in self._buckets:
+                    found.append(self._buckets[cell])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def hits(self, lines, ray=False):
+        """Intersect `lines` with the walls near them.
+
+        Returns the candidate wall indices and the `kernel.Hits` of `lines`
+        against the candidates, with the lines in the role of `line1`.
+        """
+        lines = list(lines)
+        candidates = self.candidates(lines)
+        return candidates, kernel.intersect(lines, self.segments[candidates], ray)
+
+    def crossing(self, lines):
+        """For each of `lines`, does it cross any wall?"""
+        lines = list(lines)
+        if not lines:
+            return np.zeros(0, dtype=bool)
+        _, hits = self.hits(lines)
+        return hits.mask.any(axis=1)
+
+    def crossing_wall(self, line):
+        """Return a wall `line` crosses, or None."""
+        candidates, hits = self.hits([line])
+        idx = kernel.first(hits.mask[0])
+        return None if idx is None else self.walls[candidates[idx]]
+
+    def first_hit(self, line):
+        """Return the wall `line` hits first, going from `line.p1`, together
+        with the parameter along `line` (0 at p1, 1 at p2) and the point
+        where it is hit, or None if it hits no wall.
+        """
+        candidates, hits = self.hits([line])
+        mask = hits.mask[0]
+        if not mask.any():
+            return None
+        t = np.where(mask, hits.t[0], np.inf)
+        idx = int(np.argmin(t))
+        x, y = hits.points[0, idx].tolist()
+        return self.walls[candidates[idx]], float(t[idx]), Position(x, y)
+
+    def in_rect(self, upperleft, lowerright):
+        """Return the walls meeting the rectangle between the two corners."""
+        cs = self.cellsize
+        x0, y0 = upperleft
+        x1, y1 = lowerright
+        found = set()
+        for i in range(math.floor(x0 / cs), math.floor(x1 / cs) + 1):
+            for j in range(math.floor(y0 / cs), math.floor(y1 / cs) + 1):
+                if (i, j) in self._buckets:
+                    found.update(self._buckets[(i, j)].tolist())
+        rect = (x0, y0, x1, y1)
+        segments = self.segments
+        return [
+            self.walls[idx]
+            for idx in sorted(found)
+            if _clips(*segments[idx].tolist(), rect)
+        ]
+
+
+class PointHash:
+    """Spatial hash of moving points, for "points within r of p" queries.
+
+    The points are rows of an (N, 2) array that grows at the end.  Each
+    tracked row sits in the bucket of its cell; `move` rebuckets only the
+    rows that changed cell, so keeping the hash up to date costs in
+    proportion to the points crossing cell borders.
+    """
+
+    def __init__(self, points, cellsize=64):
+        self.cellsize = cellsize
+        self._cells = np.empty((0, 2), dtype=np.int64)
+        self._tracked = np.zeros(0, dtype=bool)
+        self._buckets = {}
+        self.add(points)
+
+    def _cell_of(self, points):
+        return np.floor_divide(points, self.cellsize).astype(np.int64)
+
+    def add(self, points):
+        """Track `points` as the rows following the current last row."""
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        start = len(self._cells)
+        cells = self._cell_of(points)
+        self._cells = np.concatenate([self._cells, cells])
+        self._tracked = np.concatenate([self._tracked, np.ones(len(cells), bool)])
+        for row, cell in enumerate(map(tuple, cells.tolist()), start):
+            self._buckets.setdefault(cell, set()).add(row)
+
+    def discard(self, rows):
+        """Stop tracking `rows`."""
+        for row in np.atleast_1d(rows).tolist():
+            if self._tracked[row]:
+                self._tracked[row] = False
+                cell = tuple(self._cells[row].tolist())
+                bucket = self._buckets[cell]
+                bucket.discard(row)
+                if not bucket:
+                    del self._buckets[cell]
+
+    def move(self, points):
+        """Update to the new positions `points` of all rows, adding any new
+        rows at the end.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        old = len(self._cells)
+        cells = self._cell_of(points[:old])
+        changed = self._tracked & (cells != self._cells).any(axis=1)
+        for row in np.flatnonzero(changed).tolist():
+            cell = tuple(self._cells[row].tolist())
+            bucket = self._buckets[cell]
+            bucket.discard(row)
+            if not bucket:
+                del self._buckets[cell]
+            self._buckets.setdefault(tuple(cells[row].tolist()), set()).add(row)
+        self._cells[changed] = cells[changed]
+        if len(points) > old:
+            self.add(points[old:])
+
+    def near(self, points, pos, radius):
+        """Sorted rows of the tracked `points` within `radius` of `pos`."""
+        (x, y), cs = pos, self.cellsize
+        i0, i1 = math.floor((x - radius) / cs), math.floor((x + radius) / cs)
+        j0, j1 = math.floor((y - radius) / cs), math.floor((y + radius) / cs)
+        rows = []
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                rows.extend(self._buckets.get((i, j), ()))
+        rows = np.array(sorted(rows), dtype=np.int64)
+        if not len(rows):
+            return rows
+        dist = np.hypot(points[rows, 0] - x, points[rows, 1] - y)
+        return rows[dist <= radius]
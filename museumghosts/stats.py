@@ -0,0 +1,102 @@
+"""Frame time instrumentation.
+
+`FrameStats` keeps, for each of the last `maxlen` frames, the time spent in
+every stage of the frame and a few counts, in a ring buffer.  The game loop
+and the renderer record into the module level `frame_stats`::
+
+    frame_stats.begin()
+    with frame_stats.stage("update"):
+        ...
+    frame_stats.count("ghosts", drawn)
+    frame_stats.end()
+
+Outside of a frame, between `end` and the next `begin`, nothing is recorded.
+"""
+
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+STAGES = ("input", "update", "floor", "vision", "ghosts", "blend", "flip", "frame")
+COUNTS = ("walls_tested", "segments", "ghosts_drawn")
+FIELDS = tuple("{}_s".format(stage) for stage in STAGES) + COUNTS
+
+
+class FrameStats:
+    def __init__(self, maxlen=600, clock=time.perf_counter):
+        self.maxlen = maxlen
+        self.clock = clock
+        self.frames = 0  # frames begun, ever
+        self.recording = False
+        self._data = np.zeros((maxlen, len(FIELDS)))
+        self._stages = {stage: col for col, stage in enumerate(STAGES)}
+        self._counts = {name: len(STAGES) + col for col, name in enumerate(COUNTS)}
+        self._start = 0.0
+
+    def begin(self):
+        """Start recording a new frame, overwriting the oldest if full."""
+        self._row = self._data[self.frames % self.maxlen]
+        self._row[:] = 0
+        self.frames += 1
+        self.recording = True
+        self._start = self.clock()
+
+    def end(self):
+        """Stop recording the frame, and record its total time."""
+        if self.recording:
+            self._row[self._stages["frame"]] = self.clock() - self._start
+            self.recording = False
+
+    @contextmanager
+    def stage(self, name):
+        """Add the time spent in the body of the `with` to stage `name`."""
+        if not self.recording:
+            yield
+            return
+        col = self._stages[name]
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self._row[col] += self.clock() - start
+
+    def count(self, name, n):
+        """Add `n` to the count `name` of the frame."""
+        if self.recording:
+            self._row[self._counts[name]] += n
+
+    def __len__(self):
+        return min(self.frames, self.maxlen) - self.recording
+
+    def rows(self):
+        """The recorded frames, oldest first, as an (N, len(FIELDS)) array.
+
+        The frame being recorded, if any, is not included.
+        """
+        if self.frames <= self.maxlen:
+            rows = self._data[: self.frames]
+        else:
+            start = self.frames % self.maxlen
+            rows = np.concatenate([self._data[start:], self._data[:start]])
+        if self.recording:
+            rows = rows[:-1]
+        return rows.copy()
+
+    def percentiles(self, qs=(50, 95, 99)):
+        """Map every field to its percentiles `qs` over the recorded frames."""
+        rows = self.rows()
+        if not len(rows):
+            return {field: [0.0] * len(qs) for field in FIELDS}
+        values = np.percentile(rows, qs, axis=0)
+        return {field: values[:, col].tolist() for col, field in enumerate(FIELDS)}
+
+    def export(self, path):
+        """Write the recorded frames to `path` as CSV, a header and a row per
+        frame, times in seconds.
+        """
+        header = ",".join(FIELDS)
+        np.savetxt(path, self.rows(), delimiter=",", header=header, comments="")
+
+
+frame_stats = FrameStats()
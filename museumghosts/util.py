@@ -1,10 +1,34 @@
 import random
+from contextlib import contextmanager
 
 from .geometry import Position, Line
 
+# the random numbers of a game, seeded for it to be reproduced
+rng = random.Random()
+
+
+def seed(a=None):
+    """Seed the random numbers of the game: the positions and directions of
+    the ghosts and the maze.
+    """
+    rng.seed(a)
+
+
+@contextmanager
+def seeded(a=None):
+    """Seed the random numbers of the game for the body of the `with`, and
+    put them back as they were after, for the game of the caller.
+    """
+    state = rng.getstate()
+    rng.seed(a)
+    try:
+        yield
+    finally:
+        rng.setstate(state)
+
 
 def _rand(max_):
-    return random.randint(0, max_)
+    return rng.randint(0, int(max_))  # a level bundle stores its size as floats
 
 
 def randpos(size):
@@ -0,0 +1,358 @@
+"""Many games stepped in lockstep, as stacked arrays.
+
+`VecEnv` holds the guards, the ghosts and the walls of `n` games in arrays
+with the game as the first axis, and plays a tick of all of them with a
+handful of NumPy calls: the movement, the shots, the ghosts and the game
+status, for bots to be trained and evaluated on thousands of games at once::
+
+    env = VecEnv(resolution=(22, 14))
+    obs = env.reset(1000, seed=0)
+    while not env.dones.all():
+        obs, rewards, dones, status = env.step(Actions(keys, vision, fire))
+
+The scalar `World`, played by `engine.Engine`, remains the reference: on the
+same input a game goes the same way in both, and `VecEnv.from_worlds` loads
+any worlds into the arrays.  Only what is drawn, the explosions and the
+history, is left out.
+
+The ghosts of a game keep the rows of its `GhostStore`, new ghosts appended;
+the arrays grow to the most ghosts any game has, and the rows a game does
+not have are NaN.
+"""
+
+import random
+from collections import namedtuple
+
+import numpy as np
+
+from . import kernel, util
+from .game import MOVEMENT_KEYS, setup_game
+from .gameobjects import GHOST_SIZE
+from .hitscan import HITBOX, _slabs
+
+STATUS = (None, "collision", "won", "died")
+_COLLISION, _WON, _DIED = 1, 2, 3
+
+Actions = namedtuple("Actions", "keys, vision, fire", defaults=(None, None, None))
+Actions.__doc__ = """The input of all games for one tick, each field optional.
+
+`keys` is an (n, 4) bool array of the movement keys held down, in the order
+of `game.MOVEMENT_KEYS` (w, d, a, s); `vision` an (n, 2) array of where the
+guards look, rows of NaN to keep looking where they looked; `fire` an (n,)
+bool array of the guards that shoot.
+"""
+
+# the step of every movement key, as Player.up, right, left and down
+_MOVES = {
+    0: (1, -1),  # w: y, towards negative
+    1: (0, 1),  # d: x, towards positive
+    2: (0, -1),  # a: x, towards negative
+    3: (1, 1),  # s: y, towards positive
+}
+assert len(MOVEMENT_KEYS) == len(_MOVES)
+
+
+class VecEnv:
+    """`n` games in lockstep, `dt` seconds per tick.
+
+    If `resolution`, (columns, rows), is given, the observations include a
+    low resolution map of what each guard sees.
+    """
+
+    def __init__(self, dt=0.02, resolution=None, chunk=2 ** 16):
+        self.dt = dt
+        self.resolution = resolution
+        self.chunk = chunk  # entries of the largest intermediate array
+        self.n = 0
+
+    def reset(self, n, seed=None):
+        """Start `n` new games, as `game.setup_game` sets them up, from
+        `seed`; return the observations.
+
+        The seed of game i is `self.seeds[i]`: `util.seed(self.seeds[i])`
+        followed by `setup_game()` makes its `World`.  The random numbers of
+        the process are left as they were.
+        """
+        rng = random.Random(seed)
+        seeds = [rng.getrandbits(64) for _ in range(n)]
+        worlds = []
+        for world_seed in seeds:
+            with util.seeded(world_seed):
+                worlds.append(setup_game(clock=lambda: 0.0))
+        self._load(worlds)
+        self.seeds = seeds
+        return self.observe()
+
+    @classmethod
+    def from_worlds(cls, worlds, **kwargs):
+        """Return a `VecEnv` of the games of `worlds`, from their start."""
+        env = cls(**kwargs)
+        env._load(list(worlds))
+        env.seeds = None
+        return env
+
+    def _load(self, worlds):
+        n = self.n = len(worlds)
+        self.size = kernel.points(world.size for world in worlds)
+        self.pos = kernel.points(world.player.pos for world in worlds)
+        self.direction = kernel.points(world.player.direction for world in worlds)
+        self.vision = kernel.points(world.player.vision for world in worlds)
+
+        self.walls = np.full((n, max(len(w.walls) for w in worlds), 4), np.nan)
+        for walls, world in zip(self.walls, worlds):
+            kernel.segments(world.walls, out=walls)
+
+        g = max(len(world.ghosts) for world in worlds)
+        self.ghost_pos = np.full((n, g, 2), np.nan)
+        self.ghost_dir = np.full((n, g, 2), np.nan)
+        self.ghost_time = np.full((n, g), np.nan)
+        self.exists = np.zeros((n, g), dtype=bool)
+        self.dead = np.zeros((n, g), dtype=bool)
+        self.count = np.zeros(n, dtype=np.int64)
+        for i, world in enumerate(worlds):
+            store, k = world.ghosts, len(world.ghosts)
+            self.ghost_pos[i, :k] = store.pos
+            self.ghost_dir[i, :k] = store.direction
+            self.ghost_time[i, :k] = store.time
+            self.exists[i, :k] = True
+            self.dead[i, :k] = store.dead
+            self.count[i] = k
+
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.status = self._status()
+        if self.resolution is not None:
+            self._load_cells()
+
+    @property
+    def alive(self):
+        """(n, g) mask of the live ghosts."""
+        return self.exists & ~self.dead
+
+    @property
+    def dones(self):
+        return self.status != 0
+
+    def step(self, actions=Actions()):
+        """Play a tick of every game not over, and return the observations,
+        the ghosts each guard killed, whether each game is over and the
+        status of each game, an index into `STATUS`.
+        """
+        playing = self.status == 0
+        now = self.ticks * self.dt
+
+        if actions.vision is not None:
+            vision = np.asarray(actions.vision, dtype=float)
+            rows = playing & ~np.isnan(vision).any(axis=1)
+            self.vision[rows] = vision[rows]
+
+        kills = np.zeros(self.n, dtype=np.int64)
+        if actions.fire is not None:
+            rows = np.flatnonzero(playing & np.asarray(actions.fire, dtype=bool))
+            if len(rows):
+                kills[rows] = self._fire(rows)
+
+        moved = np.zeros(self.n, dtype=bool)
+        if actions.keys is not None:
+            keys = np.asarray(actions.keys, dtype=bool)
+            for key in range(len(MOVEMENT_KEYS)):
+                rows = np.flatnonzero(playing & keys[:, key])
+                if len(rows):
+                    self._move(rows, key)
+                    moved[rows] = True
+        self.direction[playing & ~moved] = 0
+
+        self._tick_ghosts(playing, now, self.dt * 1000)
+        self.ticks[playing] += 1
+        self.status[playing] = self._status()[playing]
+        return self.observe(), kills, self.dones, self.status.copy()
+
+    def _crossing(self, rows, segments):
+        """For each game of `rows`, does its segment cross one of its walls?"""
+        hits = kernel.intersect(segments[:, None], self.walls[rows])
+        return hits.mask.any(axis=(1, 2))
+
+    def _move(self, rows, key):
+        """Player.up, right, left or down, for the guards of `rows`."""
+        axis, sign = _MOVES[key]
+        pos, direction = self.pos[rows], self.direction[rows]
+        if sign < 0:
+            step = np.minimum(direction[:, axis] - 2, -1)
+        else:
+            step = np.maximum(direction[:, axis] + 2, 1)
+        npos = pos.copy()
+        npos[:, axis] += step
+
+        blocked = self._crossing(rows, np.hstack([pos, npos]))
+        direction[:, axis] = step
+        direction[blocked] = 0
+        npos[blocked] = pos[blocked]
+
+        # Player.inside: the guard stays off the edges, and stops there
+        inside = np.clip(npos, 5, self.size[rows] - 5)
+        direction[(inside != npos).any(axis=1)] = 0
+        self.pos[rows] = inside
+        self.direction[rows] = direction
+
+    def _fire(self, rows):
+        """World.fire for the guards of `rows`: kill the first ghost each
+        shot hits before any wall, and return the number killed.
+        """
+        rays = np.hstack([self.pos[rows], self.vision[rows]])[:, None]
+        hits = kernel.intersect(rays, self.walls[rows])
+        wall_t = np.where(hits.mask, hits.t, np.inf).min(axis=(1, 2))
+
+        pos = self.ghost_pos[rows]
+        boxes = np.concatenate([pos - HITBOX, pos + HITBOX], axis=-1)
+        enter = _slabs(rays, boxes)[:, 0]
+        enter[~self.alive[rows]] = np.inf
+        ghost = enter.argmin(axis=1)
+        ghost_t = enter[np.arange(len(rows)), ghost]
+        hit = np.isfinite(ghost_t) & (ghost_t <= wall_t)
+        self.dead[rows[hit], ghost[hit]] = True
+        return hit.astype(np.int64)
+
+    def _tick_ghosts(self, playing, now, elapsed):
+        """GhostStore.tick of the games `playing`."""
+        alive = self.alive & playing[:, None]
+        direction = self.ghost_dir
+        pos = self.ghost_pos + direction * (elapsed * alive)[..., None]
+        ndir = direction.copy()
+        x, y = pos[..., 0], pos[..., 1]
+        width, height = self.size[:, None, 0], self.size[:, None, 1]
+
+        # a ghost out on both axes takes the vertical bounce, like Ghost.tick
+        out = alive & ((x < 24) | (x > width - 24))
+        x[out] = np.where(x < 24, 25, width - 25)[out]
+        ndir[out] = direction[out] * (-1, 1)
+        out = alive & ((y < 24) | (y > height - 24))
+        y[out] = np.where(y < 24, 25, height - 25)[out]
+        ndir[out] = direction[out] * (1, -1)
+
+        spawn = alive & (now[:, None] - self.ghost_time > 12)
+        self.ghost_pos, self.ghost_dir = pos, ndir
+        if not spawn.any():
+            return
+
+        # spawning ghosts keep their direction from before the bounce, and
+        # two more are appended per game: first all the ones at +24, then
+        # all the ones at -24, in the order of their parents
+        ndir[spawn] = direction[spawn]
+        self.ghost_time[spawn] = np.broadcast_to(now[:, None], spawn.shape)[spawn]
+        born = spawn.sum(axis=1)
+        self._grow(int((self.count + 2 * born).max()))
+        games, parents = np.nonzero(spawn)
+        rank = (np.cumsum(spawn, axis=1) - 1)[games, parents]
+        first = self.count[games] + rank
+        second = first + born[games]
+        for rows, offset, flip in ((first, 24, (-1, 1)), (second, -24, (1, -1))):
+            self.ghost_pos[games, rows] = self.ghost_pos[games, parents] + offset
+            self.ghost_dir[games, rows] = direction[games, parents] * flip
+            self.ghost_time[games, rows] = now[games]
+            self.exists[games, rows] = True
+            self.dead[games, rows] = False
+        self.count += 2 * born
+
+    def _grow(self, g):
+        """Make room for `g` ghosts per game."""
+        more = g - self.exists.shape[1]
+        if more <= 0:
+            return
+
+        def pad(array, value):
+            shape = (self.n, more) + array.shape[2:]
+            return np.concatenate([array, np.full(shape, value, array.dtype)], 1)
+
+        self.ghost_pos = pad(self.ghost_pos, np.nan)
+        self.ghost_dir = pad(self.ghost_dir, np.nan)
+        self.ghost_time = pad(self.ghost_time, np.nan)
+        self.exists = pad(self.exists, False)
+        self.dead = pad(self.dead, False)
+
+    def _status(self):
+        """game.game_status of every game, as an index into `STATUS`."""
+        alive = self.alive
+        gap = np.hypot(*(self.ghost_pos - self.pos[:, None]).transpose(2, 0, 1))
+        collision = (alive & (gap <= max(GHOST_SIZE))).any(axis=1)
+        num_alive = alive.sum(axis=1)
+        return np.select(
+            [collision, num_alive == 0, num_alive > 100], [_COLLISION, _WON, _DIED], 0
+        ).astype(np.int8)
+
+    def observe(self):
+        """The observations of all games, a dict of arrays:
+
+        ``player`` (n, 2) and ``vision`` (n, 2), the positions of the guards
+        and where they look; ``ghosts`` (n, g, 2) and ``alive`` (n, g), the
+        rows of the ghosts.  With a `resolution` (columns, rows) also
+        ``visible`` (n, rows, columns), whether the guard sees the centre of
+        each cell, and ``ghost_map``, the number of live ghosts in each cell
+        the guard sees.
+        """
+        obs = {
+            "player": self.pos.copy(),
+            "vision": self.vision.copy(),
+            "ghosts": self.ghost_pos.copy(),
+            "alive": self.alive,
+        }
+        if self.resolution is not None:
+            obs["visible"], obs["ghost_map"] = self._maps()
+        return obs
+
+    def _load_cells(self):
+        """The centres of the cells of the maps, and what of the sight lines
+        to them does not change during a game: the side of each wall the
+        centres are on, and their cross products with the wall ends.
+        """
+        cols, rows = self.resolution
+        cell = self.size / (cols, rows)
+        i, j = np.meshgrid(np.arange(cols) + 0.5, np.arange(rows) + 0.5)
+        centres = np.stack([i.ravel(), j.ravel()], axis=1) * cell[:, None]
+        c = centres[:, :, None]  # (n, cells, 1, 2)
+        a, b = self.walls[:, None, :, :2], self.walls[:, None, :, 2:]
+        side = np.sign(_cross(b - a, c - a))
+        self._cell, self._centres = cell, centres
+        self._sides = np.nan_to_num(side).astype(np.int8)  # (n, cells, walls)
+        self._ca = _cross(c, a).astype(np.float32)
+        self._cb = _cross(c, b).astype(np.float32)
+
+    def _maps(self):
+        """`visible` and `ghost_map` of the observations.
+
+        The sight line from the guard p to a centre c is blocked by a wall
+        ab when each straddles the line of the other, touching counts.  As
+        (c - p) x (a - p) = c x a - c x p + a x p, and the centres and walls
+        stay put, that is a few sums per wall and cell.
+        """
+        cols, rows = self.resolution
+        n, cells = self.n, cols * rows
+        visible = np.empty((n, cells), dtype=bool)
+        step = max(1, self.chunk // (cells * self.walls.shape[1]))
+        for start in range(0, n, step):
+            games = slice(start, start + step)
+            walls, pos = self.walls[games], self.pos[games, None]
+            a, b = walls[..., :2], walls[..., 2:]
+            pov_side = np.sign(_cross(b - a, pos - a)).astype(np.float32)
+            straddle = pov_side[:, None] * self._sides[games] <= 0
+            cp = _cross(self._centres[games], pos).astype(np.float32)[..., None]
+            ends = self._ca[games] - cp
+            ends += _cross(a, pos).astype(np.float32)[:, None]
+            other = self._cb[games] - cp
+            other += _cross(b, pos).astype(np.float32)[:, None]
+            ends *= other
+            straddle &= ends <= 0
+            visible[games] = ~straddle.any(axis=2)
+        visible = visible.reshape(n, rows, cols)
+
+        games, ghosts = np.nonzero(self.alive)
+        cells = np.floor(self.ghost_pos[games, ghosts] / self._cell[games])
+        ci = np.clip(cells[:, 0].astype(np.int64), 0, cols - 1)
+        cj = np.clip(cells[:, 1].astype(np.int64), 0, rows - 1)
+        ghost_map = np.zeros((n, rows, cols), dtype=np.int16)
+        np.add.at(ghost_map, (games, cj, ci), 1)
+        ghost_map[~visible] = 0
+        return visible, ghost_map
+
+
+def _cross(u, v):
+    """The z of the cross products of the vectors `u` and `v`, (..., 2)."""
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
@@ -29,7 +29,15 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     install_requires=requirements(),
     tests_require=list(requirements()) + ["pytest"],
-    entry_points={"console_scripts": ["museumghosts=museumghosts:main"]},
+    entry_points={
+        "console_scripts": [
+            "museumghosts=museumghosts:main",
+            "museumghosts-level=museumghosts.bundle:main",
+            "museumghosts-bench=museumghosts.benchmark:main",
+            "museumghosts-replay=museumghosts.recording:main",
+            "museumghosts-server=museumghosts.server:main",
+        ]
+    },
     include_package_data=True,
     test_suite="tests",
 )
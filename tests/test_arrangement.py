@@ -0,0 +1,46 @@
+from museumghosts import Line, Particle, Position, Wall, World, line_point_collection
+from museumghosts.arrangement import Arrangement
+
+
+def linepts(x1, y1, x2, y2):
+    return Line(Position(x1, y1), Position(x2, y2))
+
+
+def _walls():
+    return [Wall(linepts(1, 1, 2, 3)), Wall(linepts(1, 3, 2, 1))]
+
+
+def test_arrangement_pieces():
+    arr = Arrangement(_walls())
+    crossing = Position(1.5, 2)
+    assert arr.crossings[linepts(1, 1, 2, 3)] == set([crossing])
+    assert len(arr) == 4
+    assert arr.piece_walls == [0, 0, 1, 1]
+    assert arr.adjacency[crossing] == set(
+        [Position(1, 1), Position(2, 3), Position(1, 3), Position(2, 1)]
+    )
+    assert arr.piece_segments.shape == (4, 4)
+
+
+def test_arrangement_crossing_wall():
+    walls = _walls()
+    arr = Arrangement(walls)
+    assert arr.crossing_wall(linepts(0, 2, 1.2, 2)) is None
+    assert arr.crossing_wall(linepts(0, 2, 3, 2)) is walls[0]
+
+
+def test_line_point_collection_arrangement():
+    walls = _walls()
+    pov = Position(3, 2)
+    assert line_point_collection(pov, walls) == line_point_collection(
+        pov, walls, Arrangement(walls)
+    )
+
+
+def test_world_keeps_arrangement_with_walls():
+    world = World(Position(4, 4), Particle(Position(0, 2)), [], _walls(), [], [])
+    arr = world.arrangement
+    assert world.but(player=Particle(Position(3, 2))).arrangement is arr
+
+    empty = world.but(walls=[])
+    assert empty.walls == [] and len(empty.arrangement) == 0
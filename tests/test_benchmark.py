@@ -0,0 +1,36 @@
+import json
+
+from museumghosts.benchmark import BENCHMARKS, Scenario, generate, main, run
+
+
+def test_generate():
+    world = generate(Scenario(cols=3, rows=2, walls=5, ghosts=20, seed=1))
+    assert world.size.tup == (700, 500)
+    # 4 boundary walls, the 5 edges of a spanning tree of 6 rooms, merged, and
+    # 5 extra
+    assert 4 + 2 + 5 <= len(world.walls) <= 4 + 5 + 5
+    assert len(world.ghosts) == 20
+    again = generate(Scenario(cols=3, rows=2, walls=5, ghosts=20, seed=1))
+    assert again.walls == world.walls
+
+
+def test_run_all():
+    results = run(Scenario(cols=2, rows=1, ghosts=3), repeat=1, min_time=0)
+    assert [r["name"] for r in results] == list(BENCHMARKS)
+    assert all(r["best"] > 0 and r["median"] >= r["best"] for r in results)
+
+
+def test_main_writes_json(tmp_path):
+    path = tmp_path / "bench.json"
+    argv = ["--cells", "2x1", "--repeat", "1", "-k", "intersects", "-o", str(path)]
+    main(argv)
+    report = json.loads(path.read_text())
+    assert report["scenario"]["cols"] == 2
+    assert 0 <= report["scenario"]["wall_reduction"] < 1
+    assert [r["name"] for r in report["results"]] == ["intersects"]
+
+
+def test_main_single_room(tmp_path):
+    path = tmp_path / "bench.json"
+    main(["--cells", "1x1", "--repeat", "1", "-k", "intersects", "-o", str(path)])
+    assert json.loads(path.read_text())["scenario"]["wall_reduction"] is None
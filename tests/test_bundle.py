@@ -0,0 +1,70 @@
+import pytest
+
+from museumghosts import World, Wall, Line, Position, Particle
+from museumghosts.bundle import BundleError, compile_level, load_level
+from museumghosts.game import setup_game
+
+
+def linepts(x1, y1, x2, y2):
+    return Line(Position(x1, y1), Position(x2, y2))
+
+
+def _world():
+    SIZE = Position(200, 100)
+    walls = [
+        Wall(linepts(0, 0, 200, 0)),
+        Wall(linepts(200, 0, 200, 100)),
+        Wall(linepts(200, 100, 0, 100)),
+        Wall(linepts(0, 100, 0, 0)),
+        Wall(linepts(50, 20, 150, 80)),
+        Wall(linepts(50, 80, 150, 20)),
+    ]
+    return World(SIZE, Particle(Position(20, 50)), [], walls, [], [])
+
+
+def test_bundle_roundtrip(tmp_path):
+    world = _world()
+    path = str(tmp_path / "level.mgl")
+    compile_level(world, path)
+    level = load_level(path, walls=world.walls)
+
+    assert level.size == world.size
+    assert level.walls == world.walls
+    assert level.arrangement.pieces == world.arrangement.pieces
+    assert level.arrangement.piece_walls == world.arrangement.piece_walls
+    assert level.arrangement.crossings == world.arrangement.crossings
+    assert level.pvs.shape == (2, 1)
+    pos = Position(20, 50)
+    assert level.pvs[pos].walls == world.but(pvs=level.pvs).near(pos).walls
+
+
+def test_bundle_stale(tmp_path):
+    world = _world()
+    path = str(tmp_path / "level.mgl")
+    compile_level(world, path)
+    with pytest.raises(BundleError):
+        load_level(path, walls=world.walls[:-1])
+
+
+def test_bundle_corrupt(tmp_path):
+    path = tmp_path / "level.mgl"
+    compile_level(_world(), str(path))
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(BundleError):
+        load_level(str(path))
+    load_level(str(path), verify=False)
+
+    path.write_bytes(b"not a level")
+    with pytest.raises(BundleError):
+        load_level(str(path))
+
+
+def test_setup_game_uses_level_size(tmp_path):
+    path = str(tmp_path / "level.mgl")
+    compile_level(_world(), path)
+    world = setup_game(level=path, clock=lambda: 0.0)
+    assert world.size == Position(200, 100)
+    assert world.player.pos == Position(100, 50)
+    assert all(0 <= x <= 200 and 0 <= y <= 100 for x, y in world.ghosts.pos)
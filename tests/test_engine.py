@@ -0,0 +1,54 @@
+import pygame
+
+from museumghosts import World, Wall, Line, Position, Ghost, Particle, Forgetlist
+from museumghosts.engine import Engine, Input
+from museumghosts.gameobjects import Player
+
+
+def _world(ghosts, clock):
+    SIZE = Position(400, 200)
+    corners = [Position(0, 0), Position(400, 0), Position(400, 200), Position(0, 200)]
+    walls = [Wall(Line(a, b)) for a, b in zip(corners, corners[1:] + corners[:1])]
+    ghosts = [
+        Ghost(Particle(Position(x, y)), time=0, direction=Position(dx, dy))
+        for x, y, dx, dy in ghosts
+    ]
+    return World(
+        SIZE,
+        Player(Position(50, 100)),
+        ghosts,
+        walls,
+        Forgetlist(1.5, clock=clock),
+        Forgetlist(3.0, clock=clock),
+    )
+
+
+def test_fixed_timestep():
+    engine = Engine(dt=0.5)
+    engine.world = _world([(300, 100, 0.01, 0)], engine.clock)
+    assert engine.run([Input()] * 10) is None
+    assert engine.ticks == 10 and engine.clock() == 5
+    # 10 ticks of 500 ms at 0.01 per ms
+    assert engine.world.ghosts[0].pos == Position(350, 100)
+
+
+def test_scripted_input_and_status():
+    engine = Engine()
+    engine.world = _world([(300, 100, 0, 0)], engine.clock)
+    x = engine.world.player.pos.x
+    engine.run([Input(keys=(pygame.K_d,))] * 3)
+    assert engine.world.player.pos.x > x
+
+    shoot = Input(vision=(390, 100), fire=True)
+    assert engine.step(shoot) == "won"
+    assert len(engine.world.explosions) == 1
+    assert engine.step(Input()) == "won"
+    assert engine.ticks == 4
+
+
+def test_policy_runs_until_collision():
+    engine = Engine(dt=0.1)
+    engine.world = _world([(300, 100, -0.05, 0)], engine.clock)
+    status = engine.run(lambda world, tick: Input(), ticks=1000)
+    assert status == "collision"
+    assert engine.ticks < 1000
@@ -0,0 +1,54 @@
+from museumghosts import Forgetlist
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return self.now
+
+
+def test_forgets_after_duration():
+    clock = _Clock()
+    forgotten = []
+    lst = Forgetlist(1.5, clock=clock, on_expire=forgotten.append)
+    assert lst.append("a") is lst
+    clock.now = 1.0
+    lst.append("b").append("c")
+    assert list(lst) == ["a", "b", "c"] and len(lst) == 3
+    assert lst[0] == "a" and lst[-1] == "c"
+
+    clock.now = 1.5
+    assert "a" not in lst and "b" in lst
+    assert list(lst) == ["b", "c"]
+    clock.now = 3.0
+    assert len(lst) == 0 and "c" not in lst
+    # forgotten in bulk, oldest first
+    assert forgotten == [["a"], ["b", "c"]]
+
+
+def test_membership_counts_duplicates():
+    clock = _Clock()
+    lst = Forgetlist(1.0, clock=clock)
+    lst.append("a")
+    clock.now = 0.5
+    lst.append("a")
+    clock.now = 1.0
+    assert "a" in lst and len(lst) == 1
+    clock.now = 1.5
+    assert "a" not in lst
+
+
+def test_maxsize_and_single_clock_read():
+    clock = _Clock()
+    forgotten = []
+    lst = Forgetlist(10, clock=clock, maxsize=3, on_expire=forgotten.extend)
+    reads = clock.reads
+    for i in range(5):
+        lst.append(i)
+    assert clock.reads - reads == 5
+    assert list(lst) == [2, 3, 4]
+    assert forgotten == [0, 1]
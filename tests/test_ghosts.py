@@ -0,0 +1,105 @@
+import random
+
+import numpy as np
+
+from museumghosts import World, Wall, Line, Position, Particle, Ghost, GhostStore
+from museumghosts.arrangement import Neighbourhood
+from museumghosts.gameobjects import Player
+
+
+def _ghosts(rng, n=30):
+    return [
+        Ghost(
+            Particle(Position(rng.uniform(0, 200), rng.uniform(0, 100))),
+            time=rng.uniform(0, 20),
+            direction=Position(rng.uniform(-1, 1), rng.uniform(-1, 1)),
+            is_dead=rng.random() < 0.2,
+        )
+        for _ in range(n)
+    ]
+
+
+def _key(ghost):
+    return ghost.pos.tup, ghost.direction.tup, ghost.time, ghost.is_dead
+
+
+def test_store_roundtrip():
+    ghosts = _ghosts(random.Random(0))
+    store = GhostStore.from_ghosts(ghosts)
+    assert len(store) == len(ghosts)
+    assert [_key(g) for g in store] == [_key(g) for g in ghosts]
+    assert _key(store[-1]) == _key(ghosts[-1])
+    assert store.num_dead == sum(g.is_dead for g in ghosts)
+
+
+def test_store_tick_matches_ghost_tick():
+    rng = random.Random(1)
+    size = Position(200, 100)
+    ghosts = _ghosts(rng)
+    store = GhostStore.from_ghosts(ghosts)
+    for step in range(40):
+        now = 10 + step * 0.5
+        ghosts = [new for g in ghosts for new in g.tick(size, now, 7)]
+        store = store.tick(size, now, 7)
+        assert sorted(map(_key, store)) == sorted(map(_key, ghosts))
+
+
+def test_fire_kills_ghost():
+    size = Position(200, 100)
+    ghosts = [
+        Ghost(Particle(Position(150, 50)), direction=Position(0, 0)),
+        Ghost(Particle(Position(150, 10)), direction=Position(0, 0)),
+    ]
+    player = Player(Position(10, 50), vision=Position(190, 50))
+    wall = Wall(Line(Position(0, 0), Position(200, 0)))
+    world = World(size, player, ghosts, [wall], [], [])
+    fired = world.fire(now=1)
+    assert [g.is_dead for g in fired.ghosts] == [True, False]
+    assert not any(g.is_dead for g in world.ghosts)
+
+
+def test_sees_matches_scalar_line_of_sight():
+    rng = random.Random(2)
+    size = Position(200, 100)
+    walls = [
+        Wall(Line(Position(50, 0), Position(50, 70))),
+        Wall(Line(Position(100, 30), Position(100, 100))),
+        Wall(Line(Position(120, 20), Position(180, 60))),
+    ]
+    ghosts = _ghosts(rng, 200)
+    world = World(size, Player(Position(20, 50)), ghosts, walls, [], [])
+    expected = [
+        world.crossing_wall(Line(world.player.pos, g.pos)) is None for g in ghosts
+    ]
+    assert world.sees(world.ghosts.pos).tolist() == expected
+    assert world.sees(world.ghosts.pos, chunk=7).tolist() == expected
+    assert len(world.sees(world.ghosts.pos[:0])) == 0
+
+
+def test_store_near_and_counters():
+    rng = random.Random(3)
+    size = Position(200, 100)
+    store = GhostStore.from_ghosts(_ghosts(rng))
+    store.near(Position(0, 0), 1)  # build the hash, to be carried along
+    for step in range(30):
+        store = store.tick(size, 10 + step * 0.5, 7)
+        if step % 5 == 0:
+            store = store.kill([rng.randrange(len(store)) for _ in range(3)])
+        assert store.num_dead == int(store.dead.sum())
+        assert store.num_alive == len(store) - store.num_dead
+        pos = Position(rng.uniform(0, 200), rng.uniform(0, 100))
+        dist = [pos.dist(g.pos) for g in store]
+        expected = [i for i, g in enumerate(store) if not g.is_dead and dist[i] <= 30]
+        assert store.near(pos, 30).tolist() == expected
+
+
+def test_sees_ignores_potentially_visible_walls():
+    size = Position(200, 100)
+    walls = [Wall(Line(Position(50, 0), Position(50, 100)))]
+    ghosts = [Ghost(Particle(Position(150, 50)), direction=Position(0, 0))]
+    world = World(size, Player(Position(20, 50)), ghosts, walls, [], [])
+    # potentially visible walls that missed the wall between
+    missed = Neighbourhood([], np.empty((0, 4)), [])
+    world = world.but(pvs={world.player.pos: missed})
+    assert world.near(world.player.pos) is missed
+    assert world.sees(world.ghosts.pos).tolist() == [False]
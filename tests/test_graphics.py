@@ -0,0 +1,96 @@
+import pygame
+
+from museumghosts import World, Wall, Line, Position, Particle, Ghost
+from museumghosts.gameobjects import Player
+from museumghosts.graphics import VisionCache, draw_world, inverted, static_layer
+
+
+def _world(pov):
+    SIZE = Position(64, 48)
+    bnw = Position(0, 0)
+    bne = Position(SIZE.x, 0)
+    bsw = Position(0, SIZE.y)
+    bse = Position(SIZE.x, SIZE.y)
+    boundary = [
+        Wall(Line(bnw, bne)),
+        Wall(Line(bne, bse)),
+        Wall(Line(bse, bsw)),
+        Wall(Line(bsw, bnw)),
+    ]
+    return World(SIZE, Particle(pov), [], boundary, [], [])
+
+
+def test_vision_cache_reuses_standing_guard():
+    cache = VisionCache(maxsize=2)
+    world = _world(Position(10, 10))
+    vision = cache.get(world)
+    assert cache.get(world.but(player=Particle(Position(10, 10)))) is vision
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert isinstance(vision.mask, pygame.Surface)
+
+
+def test_vision_cache_is_bounded():
+    cache = VisionCache(maxsize=2)
+    world = _world(Position(10, 10))
+    for x in range(10, 15):
+        world = world.but(player=Particle(Position(x, 10)))
+        cache.get(world)
+    assert len(cache) == 2
+    assert cache.misses == 5
+
+
+def test_vision_cache_new_walls():
+    cache = VisionCache()
+    world = _world(Position(10, 10))
+    cache.get(world)
+    cache.get(
+        world.but(walls=world.walls + [Wall(Line(Position(20, 0), Position(20, 5)))])
+    )
+    assert cache.misses == 2
+
+
+def test_dirty_rects():
+    surface = pygame.Surface((64, 48))
+    ghost = Ghost(Particle(Position(40, 20)), direction=Position(0.01, 0))
+    world = _world(Position(10, 10)).but(player=Player(Position(10, 10)))
+    world = world.but(ghosts=[ghost])
+    assert draw_world(surface, world, now=0, flip=False) is None
+
+    moved = world.but(ghosts=world.ghosts.tick(world.size, 0, 100))
+    rects = draw_world(surface, moved, now=0, flip=False)
+    corners = [g.pos - Position(12, 12) for g in (world.ghosts[0], moved.ghosts[0])]
+    assert [tuple(r) for r in rects] == [(int(c.x), int(c.y), 24, 24) for c in corners]
+
+    # the guard moves, so the vision does, and so all of the screen
+    guard = moved.but(player=Player(Position(12, 10)))
+    assert draw_world(surface, guard, now=0, flip=False) is None
+
+    # a ghost dies, and the layer of dead ghosts changes
+    dead = guard.but(ghosts=guard.ghosts.kill([0]))
+    assert draw_world(surface, dead, now=0, flip=False) is None
+    assert draw_world(surface, dead, now=0, flip=False) == []
+
+
+def test_static_layer_is_kept():
+    world = _world(Position(10, 10))
+    layer = static_layer.get(world)
+    assert static_layer.get(world.but(player=Particle(Position(20, 20)))) is layer
+    walls = world.walls + [Wall(Line(Position(20, 0), Position(20, 5)))]
+    assert static_layer.get(world.but(walls=walls)) is not layer
+
+
+def test_inverted_vision_mask():
+    world = _world(Position(10, 10))
+    wall = Wall(Line(Position(30, 0), Position(30, 40)))
+    world = world.but(walls=world.walls + [wall])
+    mask = VisionCache().get(world).mask
+    assert mask.get_at((10, 10))[:3] == (0, 0, 0)
+    assert mask.get_at((50, 10))[:3] == (235, 235, 235)  # behind the wall
+
+    sprite = pygame.Surface((2, 1), pygame.SRCALPHA)
+    sprite.fill((10, 20, 30, 40))
+    sprite.set_at((1, 0), (0, 0, 0, 0))
+    inv = inverted(sprite)
+    assert tuple(inv.get_at((0, 0))) == (245, 235, 225, 40)
+    assert inv.get_at((1, 0)).a == 0
+    assert tuple(sprite.get_at((0, 0))) == (10, 20, 30, 40)
@@ -0,0 +1,70 @@
+import numpy as np
+
+from museumghosts import World, Wall, Line, Position, Ghost, Particle
+from museumghosts.gameobjects import Player
+from museumghosts.hitscan import _slabs, scan
+
+
+def linepts(x1, y1, x2, y2):
+    return Line(Position(x1, y1), Position(x2, y2))
+
+
+def _world(ghosts, walls=()):
+    ghosts = [
+        Ghost(Particle(Position(x, y)), direction=Position(0, 0), is_dead=dead)
+        for x, y, dead in ghosts
+    ]
+    player = Player(Position(10, 50), vision=Position(390, 50))
+    return World(Position(400, 100), player, ghosts, list(walls), [], [])
+
+
+def test_nearest_ghost_is_hit():
+    world = _world([(300, 50, False), (100, 60, False), (60, 50, True)])
+    (hit,) = scan(world, [linepts(10, 50, 390, 50)])
+    assert hit.ghost == 1 and hit.wall is None
+    assert hit.distance == 100 - 24 - 10
+    assert hit.point == Position(76, 50)
+
+
+def test_walls_stop_shots():
+    wall = Wall(linepts(200, 0, 200, 100))
+    world = _world([(300, 50, False)], [wall])
+    (hit,) = scan(world, [linepts(10, 50, 390, 50)])
+    assert hit.wall is wall and hit.ghost is None
+    assert hit.distance == 190
+    assert scan(world, [linepts(10, 50, 20, 50)]) == [None]
+
+    fired = world.fire(now=1)
+    assert fired is world
+    assert not world.ghosts.dead.any()
+
+
+def test_burst():
+    world = _world([(100, 20, False), (100, 80, False), (300, 50, False)])
+    rays = [linepts(10, 50, 390, 50 + dy) for dy in range(-60, 61, 10)]
+    hits = scan(world, rays)
+    assert len(hits) == len(rays)
+    assert {hit.ghost for hit in hits if hit is not None} == {0, 1, 2}
+
+    fired = world.fire(now=1, rays=rays)
+    assert fired.ghosts.dead.tolist() == [True, True, True]
+    assert len(fired.explosions) == sum(hit is not None for hit in hits)
+
+
+def test_slabs():
+    boxes = np.array([[0.0, 0.0, 10.0, 10.0]])
+    rays = np.array(
+        [
+            [-10, 5, 20, 5],  # through
+            [5, 5, 20, 5],  # from inside
+            [-10, 20, 20, 20],  # parallel, outside
+            [-10, -10, -1, -1],  # stops short
+            [0, -10, 0, 20],  # along an edge
+        ],
+        dtype=float,
+    )
+    enter = _slabs(rays, boxes)[:, 0]
+    assert enter[0] == 1 / 3
+    assert enter[1] == 0
+    assert np.isinf(enter[2]) and np.isinf(enter[3])
+    assert enter[4] == 1 / 3
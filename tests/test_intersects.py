@@ -1,3 +1,5 @@
+import pickle
+
 from museumghosts import (
     World,
     Particle,
@@ -126,3 +128,14 @@ def test_lines_intersecting():
     assert Position(1.5, 2) in col[l2]
     assert len(col[l1]) == 4
     assert len(col[l2]) == 4
+
+
+def test_compact_positions():
+    p = Position(1, 2)
+    assert not hasattr(p, "__dict__")
+    assert hash(p) == hash(Position(1, 2)) == hash((1, 2))
+    assert p != (1, 2)
+    assert repr(Line(p, p)) == "Line(Position(1, 2), Position(1, 2))"
+    line = Line(p, Position(3, 4))
+    assert {line: 1}[Line(Position(1, 2), Position(3, 4))] == 1
+    assert pickle.loads(pickle.dumps(line)) == line
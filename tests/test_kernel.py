@@ -0,0 +1,70 @@
+import numpy as np
+
+from museumghosts import Line, Position, intersects
+from museumghosts import kernel
+
+
+def linepts(x1, y1, x2, y2):
+    return Line(Position(x1, y1), Position(x2, y2))
+
+
+def test_segments_shape():
+    segs = kernel.segments([linepts(0, 0, 1, 2), linepts(3, 4, 5, 6)])
+    assert segs.shape == (2, 4)
+    assert segs[1].tolist() == [3, 4, 5, 6]
+    assert kernel.segments([]).shape == (0, 4)
+
+
+def test_buffers():
+    out = np.full((4, 4), -1.0)
+    segs = kernel.segments([linepts(0, 0, 1, 2), linepts(3, 4, 5, 6)], out=out)
+    assert segs.base is out
+    assert out[:2].tolist() == [[0, 0, 1, 2], [3, 4, 5, 6]]
+    assert out[2:].tolist() == [[-1] * 4] * 2
+
+    pts = kernel.points([Position(1, 2), Position(3, 4)])
+    assert pts.tolist() == [[1, 2], [3, 4]]
+    assert kernel.points([]).shape == (0, 2)
+    assert kernel.points([], out=out[:, :2]).shape == (0, 2)
+
+
+def test_intersect_matches_scalar():
+    lines = [
+        linepts(1, 1, 2, 3),
+        linepts(1, 3, 2, 1),
+        linepts(0, 2, 5, 2),
+        linepts(0, 0, 0, 5),
+        linepts(4, 0, 4, 1),
+    ]
+    for ray in (True, False):
+        hits = kernel.intersect(lines, lines, ray=ray)
+        for i, l1 in enumerate(lines):
+            for j, l2 in enumerate(lines):
+                p = intersects(l1, l2, ray=ray)
+                assert bool(hits.mask[i, j]) == (p is not None)
+                if p is not None:
+                    assert Position(*hits.points[i, j].tolist()) == p
+
+
+def test_intersect_parallel():
+    hits = kernel.intersect([linepts(0, 0, 1, 0)], [linepts(0, 1, 1, 1)])
+    assert not hits.mask[0, 0]
+    assert np.isnan(hits.t[0, 0])
+
+
+def test_first_and_crossing():
+    walls = [linepts(0, 0, 0, 10), linepts(5, 0, 5, 10)]
+    rays = [linepts(-1, 5, 6, 5), linepts(1, 5, 4, 5)]
+    assert kernel.crossing(rays, walls).tolist() == [True, False]
+    assert kernel.first(kernel.intersect(walls, rays).mask[:, 0]) == 0
+    assert kernel.first(np.zeros(3, dtype=bool)) is None
+
+
+def test_intersect_batched():
+    a = np.array([[[0, 0, 2, 2]], [[0, 2, 2, 0]]], dtype=float)  # (2, 1, 4)
+    b = np.array([[[0, 1, 2, 1], [np.nan] * 4]], dtype=float)  # (1, 2, 4)
+    hits = kernel.intersect(a, b)
+    assert hits.mask.shape == (2, 1, 2)
+    assert hits.mask[:, 0].tolist() == [[True, False], [True, False]]
+    for k in range(2):
+        assert hits.mask[k].tolist() == kernel.intersect(a[k], b[0]).mask.tolist()
@@ -0,0 +1,89 @@
+import random
+from collections import deque
+from itertools import islice
+
+from museumghosts.game import maze, merge_collinear
+from museumghosts.geometry import Position
+from museumghosts.mazegen import Frontier, grid_tree, random_maze
+
+
+def test_merge_collinear():
+    edges = [
+        ((0, 0), (1, 0)),
+        ((2, 0), (1, 0)),
+        ((2, 0), (3, 0)),
+        ((4, 0), (5, 0)),  # a gap before this one
+        ((1, 0), (1, 1)),
+        ((1, 2), (1, 1)),
+        ((0, 0), (2, 2)),  # diagonal, kept
+    ]
+    assert sorted(merge_collinear(edges)) == sorted(
+        [
+            ((0, 0), (3, 0)),
+            ((4, 0), (5, 0)),
+            ((1, 0), (1, 2)),
+            ((0, 0), (2, 2)),
+        ]
+    )
+
+
+def test_maze_covers_the_same_walls():
+    def cells(walls):
+        """The unit edges covered by `walls`."""
+        covered = set()
+        for wall in walls:
+            (x1, y1), (x2, y2) = sorted([tuple(wall.line.p1), tuple(wall.line.p2)])
+            covered |= {
+                ((x, y), (x + (x2 > x1), y + (y2 > y1)))
+                for x in range(x1, max(x1 + 1, x2))
+                for y in range(y1, max(y1 + 1, y2))
+            }
+        return covered
+
+    walls = maze(8, 6, scal=1, offset=Position(0, 0), seed=3)
+    edges = random_maze(8, 6, seed=3).edges
+    assert len(walls) < len(edges)
+    assert cells(walls) == set(edges)
+
+
+def _poprandom(frontier):
+    i = random.randrange(len(frontier))
+    frontier[i], frontier[-1] = frontier[-1], frontier[i]
+    return frontier.pop()
+
+
+def test_grid_tree_spans_the_grid():
+    width, height = 13, 7
+    for pop in (deque.pop, deque.popleft, _poprandom):
+        edges = list(grid_tree(width, height, pop, seed=5))
+        assert len(edges) == width * height - 1
+        assert all(a < b and a[0] + a[1] + 1 == b[0] + b[1] for a, b in edges)
+
+        parent = {}
+
+        def find(node):
+            while parent.get(node, node) != node:
+                node = parent[node]
+            return node
+
+        for a, b in edges:
+            ra, rb = find(a), find(b)
+            assert ra != rb  # no cycles, so a tree
+            parent[ra] = rb
+
+
+def test_grid_tree_seed_and_streaming():
+    assert list(grid_tree(20, 10, seed=1)) == list(grid_tree(20, 10, seed=1))
+    assert list(grid_tree(20, 10, seed=1)) != list(grid_tree(20, 10, seed=2))
+    assert random_maze(20, 10, seed=1).edges == list(grid_tree(20, 10, seed=1))
+    # the first edges of a grid far too large for a set of squares
+    assert len(list(islice(grid_tree(5000, 5000, seed=1), 100))) == 100
+
+
+def test_frontier():
+    frontier = Frontier()
+    frontier.extend(range(10))
+    assert [frontier.popleft() for _ in range(6)] == [0, 1, 2, 3, 4, 5]
+    assert len(frontier) == 4 and frontier[0] == 6 and frontier[-1] == 9
+    frontier[0] = 1
+    assert frontier.pop() == 9 and frontier.popleft() == 1
@@ -0,0 +1,60 @@
+from museumghosts import World, Wall, Line, Position, Particle
+from museumghosts.preprocessor import PVS, preprocess
+
+
+def linepts(x1, y1, x2, y2):
+    return Line(Position(x1, y1), Position(x2, y2))
+
+
+def _world():
+    SIZE = Position(200, 100)
+    walls = [
+        Wall(linepts(0, 0, 200, 0)),
+        Wall(linepts(200, 0, 200, 100)),
+        Wall(linepts(200, 100, 0, 100)),
+        Wall(linepts(0, 100, 0, 0)),
+        # a closed room in the right half, invisible from the left half
+        Wall(linepts(120, 20, 180, 20)),
+        Wall(linepts(180, 20, 180, 80)),
+        Wall(linepts(180, 80, 120, 80)),
+        Wall(linepts(120, 80, 120, 20)),
+        Wall(linepts(140, 40, 160, 40)),
+    ]
+    return World(SIZE, Particle(Position(50, 50)), [], walls, [], [])
+
+
+def test_preprocess_cells():
+    world = _world()
+    visible = preprocess(world, cellsize=100)
+    assert len(visible) == 2
+    left = visible[(Position(0, 0), Position(100, 100))]
+    assert Wall(linepts(140, 40, 160, 40)) not in left
+    assert Wall(linepts(120, 80, 120, 20)) in left
+
+
+def test_pvs_lookup():
+    world = _world()
+    pvs = PVS.from_world(world, cellsize=100)
+    world = world.but(pvs=pvs)
+    assert pvs.cell(Position(150.5, 99)) == (1, 0)
+    assert Position(50, 50) in pvs
+    assert Position(250, 50) not in pvs
+
+    near = world.near(Position(50, 50))
+    assert len(near.walls) == len(near.segments) < len(world.walls)
+    assert world.near(Position(250, 50)).walls == world.walls
+    assert world.but(player=Particle(Position(1, 1))).pvs is pvs
+
+
+def test_preprocess_parallel():
+    world = _world()
+    calls = []
+    parallel = preprocess(
+        world,
+        cellsize=50,
+        processes=2,
+        progress=lambda done, total: calls.append((done, total)),
+    )
+    assert parallel == preprocess(world, cellsize=50)
+    assert list(parallel) == list(preprocess(world, cellsize=50))
+    assert calls[-1] == (8, 8)
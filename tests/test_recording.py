@@ -0,0 +1,67 @@
+import numpy as np
+import pygame
+import pytest
+
+from museumghosts import util
+from museumghosts.game import MOVEMENT_KEYS, _step, setup_game
+from museumghosts.recording import Recorder, RecordingError, read, replay
+
+
+def _script():
+    motion = pygame.event.Event(pygame.MOUSEMOTION, pos=(900, 350))
+    click = pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(900, 350))
+    key = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_d)
+    for i in range(40):
+        events = [motion, click] if i % 10 == 0 else [key] if i == 5 else []
+        keys = [pygame.K_w] if 10 <= i < 20 else []
+        yield i * 0.02, 20, keys, events
+
+
+def _record(path, seed=7):
+    with Recorder(path, seed, None, MOVEMENT_KEYS) as recorder:
+        for tick in _script():
+            recorder.tick(*tick)
+
+
+def test_read_back(tmp_path):
+    path = tmp_path / "game.mgr"
+    _record(path)
+    header, ticks = read(path, MOVEMENT_KEYS)
+    assert header.seed == 7 and header.level is None
+    ticks = list(ticks)
+    expected = list(_script())
+    assert len(ticks) == len(expected)
+    for tick, (now, elapsed, keys, events) in zip(ticks, expected):
+        assert (tick.now, tick.elapsed, tick.keys) == (now, elapsed, keys)
+        assert [e.type for e in tick.events] == [e.type for e in events]
+    assert ticks[0].events[0].pos == (900, 350)
+    assert ticks[5].events[0].key == pygame.K_d
+
+    # a tick cut short is left out
+    data = path.read_bytes()
+    path.write_bytes(data[:-3])
+    assert len(list(read(path, MOVEMENT_KEYS)[1])) == len(expected) - 1
+
+    path.write_bytes(b"not a recording at all")
+    with pytest.raises(RecordingError):
+        read(path)
+
+
+def test_replay_is_deterministic(tmp_path):
+    path = tmp_path / "game.mgr"
+    _record(path)
+    first = replay(path)
+    second = replay(path)
+    assert first.ticks == second.ticks == 40
+    assert np.array_equal(first.world.ghosts.pos, second.world.ghosts.pos)
+    assert first.world.player.pos == second.world.player.pos
+
+    # the same as playing the game live, from the same seed
+    util.seed(7)
+    now = 0.0
+    world = setup_game(clock=lambda: now)
+    for now, elapsed, keys, events in _script():
+        world = _step(world, now, elapsed, events, keys)
+    assert np.array_equal(world.ghosts.pos, first.world.ghosts.pos)
+    assert world.walls == first.world.walls
+    assert len(world.history) > 0
@@ -0,0 +1,166 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from museumghosts import util
+from museumghosts.server import LocalClient, ProtocolError, Server
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_sessions_tick_on_their_own_time_steps():
+    clock = _Clock()
+    server = Server(dt=0.02, clock=clock)
+    fast = server.create(seed=1)
+    slow = server.create(seed=2, dt=0.05)
+    clock.now = 0.1
+    assert server.advance() == 5 + 2
+    assert (fast.engine.ticks, slow.engine.ticks) == (5, 2)
+    assert len(fast.latencies) == 5 and max(fast.latencies) <= 0.08 + 1e-9
+
+    # far behind, a session skips ahead instead of playing every tick
+    clock.now = 10.0
+    server.advance()
+    assert fast.engine.ticks < 20
+
+    server.close(fast.id)
+    clock.now = 10.5
+    server.advance()
+    assert fast.engine.ticks < 20 and fast.id not in server.sessions
+
+
+def test_local_client():
+    async def play():
+        server = Server(dt=0.01)
+        runner = asyncio.ensure_future(server.run())
+        client = LocalClient(server)
+        try:
+            ids = [
+                (await client.request("new", seed=seed))["session"] for seed in (3, 4)
+            ]
+            await client.request("input", session=ids[0], keys="d", vision=[900, 350])
+            await client.request("input", session=ids[1], fire=True)
+            await asyncio.sleep(0.1)
+            state = await client.request("state", session=ids[0])
+            stats = await client.request("stats")
+            with pytest.raises(ProtocolError):
+                await client.request("state", session=99)
+            with pytest.raises(ProtocolError):
+                await client.request("input", session=ids[0], keys="x")
+            await client.request("close", session=ids[1])
+            return ids, state, stats, server
+        finally:
+            runner.cancel()
+
+    ids, state, stats, server = asyncio.run(play())
+    assert state["tick"] > 0 and state["vision"] == [900, 350]
+    assert state["player"][0] > 550 or state["status"] is not None
+    assert set(stats["sessions"]) == {str(id) for id in ids}
+    assert stats["sessions"][str(ids[0])]["latency"]["p50"] >= 0
+    assert list(server.sessions) == [ids[0]]
+    assert not server.sessions[ids[0]].input.fire
+
+
+def test_socket_protocol():
+    async def talk():
+        server = Server(dt=0.01)
+        tcp = await asyncio.start_server(server._serve_client, "127.0.0.1", 0)
+        runner = asyncio.ensure_future(server.run())
+        port = tcp.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        responses = []
+        for line in (
+            {"op": "new", "seed": 5},
+            {"op": "state", "session": 1},
+            {"op": "bogus"},
+        ):
+            writer.write(json.dumps(line).encode() + b"\n")
+            await writer.drain()
+            responses.append(json.loads(await reader.readline()))
+        writer.write(b"not json\n")
+        responses.append(json.loads(await reader.readline()))
+        writer.close()
+        runner.cancel()
+        tcp.close()
+        await tcp.wait_closed()
+        return responses
+
+    new, state, bogus, garbage = asyncio.run(talk())
+    assert new == {"session": 1}
+    assert state["session"] == 1
+    assert "error" in bogus and "error" in garbage
+
+
+def test_bad_dt_is_refused():
+    server = Server(clock=_Clock())
+    for dt in (0, -1, "x", float("nan"), True):
+        with pytest.raises(ProtocolError):
+            server.create(seed=1, dt=dt)
+        assert "error" in server.handle({"op": "new", "dt": dt})
+    assert server.sessions == {} and server._due == []
+    server.create(seed=1)
+    assert server.advance(2.0) > 0  # returns
+
+
+def test_bad_input_is_refused():
+    server = Server(clock=_Clock())
+    id = server.create(seed=1).id
+    for fields in (
+        {"vision": [1]},
+        {"vision": [1, "y"]},
+        {"vision": "ab"},
+        {"keys": 5},
+        {"keys": ["w"]},
+    ):
+        response = server.handle(dict(fields, op="input", session=id))
+        assert "error" in response
+    assert server.sessions[id].input.vision is None
+
+
+def test_failing_session_does_not_stop_the_others():
+    clock = _Clock()
+    server = Server(dt=0.02, clock=clock)
+    bad, good = server.create(seed=1), server.create(seed=2)
+    bad.input = bad.input._replace(vision=(1,))  # breaks its next tick
+    clock.now = 0.1
+    assert server.advance() == 5
+    assert good.engine.ticks == 5 and bad.engine.ticks == 0
+    assert bad.over and "TypeError" in bad.state()["failure"]
+    clock.now = 0.2
+    assert server.advance() == 5
+
+
+def test_sessions_leave_the_game_random_numbers_alone():
+    util.seed(123)
+    expected = [util.rng.random() for _ in range(3)]
+    util.seed(123)
+    Server(clock=_Clock()).create(seed=7)
+    Server(clock=_Clock()).create()
+    assert [util.rng.random() for _ in range(3)] == expected
+
+    a, b = Server(clock=_Clock()).create(seed=7), Server(clock=_Clock()).create(seed=7)
+    assert np.array_equal(a.engine.world.ghosts.pos, b.engine.world.ghosts.pos)
+
+
+def test_sessions_over_are_closed_after_a_grace_period():
+    clock = _Clock()
+    server = Server(dt=0.02, clock=clock, grace=1.0)
+    over, playing = server.create(seed=1), server.create(seed=2)
+    over.input = over.input._replace(vision=(1,))  # fails at its next tick
+    clock.now = 0.1
+    server.advance()
+    assert over.over and over.id in server.sessions
+    clock.now = 0.9
+    server.advance()
+    assert server.handle({"op": "state", "session": over.id})["failure"]
+    clock.now = 1.2
+    server.advance()
+    assert list(server.sessions) == [playing.id]
@@ -0,0 +1,114 @@
+import random
+
+import numpy as np
+
+from museumghosts import Line, Position, Wall, intersects, line_segments
+from museumghosts.arrangement import Arrangement
+from museumghosts.spatial import PointHash, WallGrid
+
+
+def linepts(x1, y1, x2, y2):
+    return Line(Position(x1, y1), Position(x2, y2))
+
+
+def _walls(rng, n=40):
+    walls = []
+    for _ in range(n):
+        x, y = rng.randint(0, 10) * 20, rng.randint(0, 10) * 20
+        if rng.random() < 0.3:
+            walls.append(Wall(linepts(x, y, rng.randint(0, 200), rng.randint(0, 200))))
+        elif rng.random() < 0.5:
+            walls.append(Wall(linepts(x, y, x + 20 * rng.randint(1, 4), y)))
+        else:
+            walls.append(Wall(linepts(x, y, x, y + 20 * rng.randint(1, 4))))
+    return walls
+
+
+def _randline(rng):
+    return linepts(*(rng.uniform(-10, 210) for _ in range(4)))
+
+
+def test_traverse_axis():
+    grid = WallGrid([], cellsize=10)
+    assert list(grid.traverse(linepts(5, 5, 35, 5))) == [(0, 0), (1, 0), (2, 0), (3, 0)]
+    assert list(grid.traverse(linepts(5, 15, 5, -5))) == [(0, 1), (0, 0), (0, -1)]
+    assert list(grid.traverse(linepts(5, 5, 6, 6))) == [(0, 0)]
+
+
+def test_grid_matches_brute_force():
+    rng = random.Random(1)
+    walls = _walls(rng)
+    grid = WallGrid(walls, cellsize=25)
+    for _ in range(300):
+        line = _randline(rng)
+        crossed = [w for w in walls if intersects(line, w, ray=False)]
+        assert grid.crossing([line])[0] == bool(crossed)
+        assert (grid.crossing_wall(line) is None) == (not crossed)
+
+        hit = grid.first_hit(line)
+        if crossed:
+            nearest = min(line.p1.dist(intersects(line, w, ray=False)) for w in crossed)
+            assert abs(line.p1.dist(hit[2]) - nearest) < 1e-9
+        else:
+            assert hit is None
+
+
+def test_grid_on_cell_borders():
+    walls = [Wall(linepts(50, 0, 50, 100))]
+    grid = WallGrid(walls, cellsize=50)
+    assert grid.crossing_wall(linepts(40, 10, 50, 10)) is walls[0]
+    assert grid.crossing_wall(linepts(60, 10, 50, 10)) is walls[0]
+    assert grid.crossing_wall(linepts(60, 10, 51, 10)) is None
+
+
+def test_in_rect():
+    rng = random.Random(2)
+    walls = _walls(rng)
+    grid = WallGrid(walls, cellsize=30)
+    rect = Position(40, 40), Position(120, 90)
+    edges = [
+        linepts(40, 40, 120, 40),
+        linepts(120, 40, 120, 90),
+        linepts(40, 90, 120, 90),
+        linepts(40, 40, 40, 90),
+    ]
+
+    def inside(p):
+        return 40 <= p.x <= 120 and 40 <= p.y <= 90
+
+    expected = [
+        w
+        for w in walls
+        if inside(w.line.p1)
+        or inside(w.line.p2)
+        or any(intersects(w, e, ray=False) for e in edges)
+    ]
+    assert grid.in_rect(*rect) == expected
+
+
+def test_line_segments_with_index():
+    rng = random.Random(3)
+    walls = _walls(rng, 12)
+    arrangement = Arrangement(walls)
+    for _ in range(10):
+        pov = Position(rng.uniform(0, 200), rng.uniform(0, 200))
+        assert set(line_segments(pov, walls)) == set(
+            line_segments(pov, walls, arrangement=arrangement)
+        )
+
+
+def test_point_hash_matches_brute_force():
+    rng = np.random.default_rng(4)
+    points = rng.uniform(0, 300, (100, 2))
+    phash = PointHash(points, cellsize=32)
+    phash.discard([3, 5, 5])
+    tracked = np.ones(len(points), dtype=bool)
+    tracked[[3, 5]] = False
+    for _ in range(20):
+        points = np.concatenate([points + rng.normal(0, 10, points.shape), [[0, 0]]])
+        tracked = np.append(tracked, True)
+        phash.move(points)
+        for pos in rng.uniform(0, 300, (10, 2)).tolist():
+            dist = np.hypot(*(points - pos).T)
+            expected = np.flatnonzero(tracked & (dist <= 40))
+            assert phash.near(points, pos, 40).tolist() == expected.tolist()
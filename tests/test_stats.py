@@ -0,0 +1,80 @@
+import pygame
+
+from museumghosts import World, Wall, Line, Position
+from museumghosts.gameobjects import Player
+from museumghosts import graphics
+from museumghosts.stats import FIELDS, FrameStats, frame_stats
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ring_buffer():
+    clock = _Clock()
+    stats = FrameStats(maxlen=4, clock=clock)
+    with stats.stage("update"):
+        clock.now += 1  # not in a frame, not recorded
+    assert len(stats) == 0 and stats.rows().shape == (0, len(FIELDS))
+
+    for frame in range(6):
+        stats.begin()
+        with stats.stage("update"):
+            clock.now += frame
+        stats.count("ghosts_drawn", frame)
+        stats.count("ghosts_drawn", 1)
+        stats.end()
+    assert len(stats) == 4
+
+    rows = stats.rows()
+    update = FIELDS.index("update_s")
+    assert rows[:, update].tolist() == [2, 3, 4, 5]
+    assert rows[:, FIELDS.index("frame_s")].tolist() == [2, 3, 4, 5]
+    assert rows[:, FIELDS.index("ghosts_drawn")].tolist() == [3, 4, 5, 6]
+    assert stats.percentiles((0, 50, 100))["update_s"] == [2, 3.5, 5]
+
+    stats.begin()  # overwrites the oldest, and is not done
+    assert len(stats) == 3
+    assert stats.rows()[:, update].tolist() == [3, 4, 5]
+
+
+def test_export(tmp_path):
+    clock = _Clock()
+    stats = FrameStats(clock=clock)
+    for _ in range(3):
+        stats.begin()
+        stats.count("segments", 7)
+        stats.end()
+    path = tmp_path / "stats.csv"
+    stats.export(str(path))
+    header, *rows = path.read_text().splitlines()
+    assert header.split(",") == list(FIELDS)
+    assert len(rows) == 3
+    assert float(rows[0].split(",")[FIELDS.index("segments")]) == 7
+
+
+def test_draw_world_records_stages():
+    size = Position(64, 48)
+    corners = [Position(0, 0), Position(64, 0), Position(64, 48), Position(0, 48)]
+    walls = [Wall(Line(a, b)) for a, b in zip(corners, corners[1:] + corners[:1])]
+    world = World(size, Player(Position(30, 30)), [], walls, [], [])
+    surface = pygame.Surface(size.tup)
+
+    graphics.vision_cache.clear()
+    frames = frame_stats.frames
+    frame_stats.begin()
+    graphics.draw_world(surface, world, now=0, flip=False, overlay=True)
+    frame_stats.end()
+    assert frame_stats.frames == frames + 1
+
+    row = frame_stats.rows()[-1]
+    assert row[FIELDS.index("walls_tested")] == 4
+    assert row[FIELDS.index("segments")] == len(
+        graphics.vision_cache.get(world).polygon
+    )
+    assert row[FIELDS.index("vision_s")] > 0
+    assert row[FIELDS.index("blend_s")] > 0
@@ -0,0 +1,90 @@
+import numpy as np
+
+from museumghosts import kernel, util
+from museumghosts.engine import Engine, Input
+from museumghosts.game import MOVEMENT_KEYS, setup_game
+from museumghosts.vecenv import STATUS, Actions, VecEnv
+
+
+def _engines(seeds):
+    engines = []
+    for seed in seeds:
+        util.seed(seed)
+        engines.append(Engine(world=setup_game(clock=lambda: 0.0), dt=0.02))
+    return engines
+
+
+def test_matches_engine():
+    n = 6
+    env = VecEnv()
+    env.reset(n, seed=3)
+    engines = _engines(env.seeds)
+    rng = np.random.default_rng(0)
+    # past 12 seconds, for the ghosts to spawn
+    for tick in range(700):
+        keys = rng.random((n, 4)) < 0.3
+        vision = rng.uniform([0, 0], [1100, 700], (n, 2))
+        vision[rng.random(n) < 0.5] = np.nan
+        fire = rng.random(n) < 0.2
+        env.step(Actions(keys, vision, fire))
+        for i, engine in enumerate(engines):
+            engine.step(
+                Input(
+                    keys=tuple(k for k, on in zip(MOVEMENT_KEYS, keys[i]) if on),
+                    vision=None if np.isnan(vision[i]).any() else tuple(vision[i]),
+                    fire=bool(fire[i]),
+                )
+            )
+
+    assert env.count.max() > env.count.min()
+    for i, engine in enumerate(engines):
+        world, k = engine.world, len(engine.world.ghosts)
+        assert tuple(env.pos[i]) == world.player.pos.tup
+        assert STATUS[env.status[i]] == engine.status
+        assert env.count[i] == k and env.exists[i].sum() == k
+        assert np.array_equal(env.ghost_pos[i, :k], world.ghosts.pos)
+        assert np.array_equal(env.dead[i, :k], world.ghosts.dead)
+
+
+def test_reset_is_seeded():
+    a, b = VecEnv(), VecEnv()
+    obs_a, obs_b = a.reset(4, seed=7), b.reset(4, seed=7)
+    assert a.seeds == b.seeds
+    util.seed(5)
+    state = util.rng.getstate()
+    a.reset(2, seed=1)
+    assert util.rng.getstate() == state
+    assert np.array_equal(obs_a["ghosts"], obs_b["ghosts"], equal_nan=True)
+    assert not a.dones.any()
+
+
+def test_games_over_stay_over():
+    env = VecEnv()
+    env.reset(3, seed=1)
+    env.ghost_pos[0, 0] = env.pos[0]  # a ghost on the guard
+    _, kills, dones, status = env.step()
+    assert dones.tolist() == [True, False, False]
+    assert STATUS[status[0]] == "collision" and kills.sum() == 0
+    pos = env.pos[0].copy()
+    env.step(Actions(keys=np.ones((3, 4), dtype=bool)))
+    assert env.ticks.tolist() == [1, 2, 2]
+    assert np.array_equal(env.pos[0], pos)
+
+
+def test_maps():
+    env = VecEnv(resolution=(11, 7))
+    obs = env.reset(5, seed=2)
+    visible, ghost_map = obs["visible"], obs["ghost_map"]
+    assert visible.shape == ghost_map.shape == (5, 7, 11)
+
+    # as the sight lines to the cell centres cross no wall
+    pov = np.broadcast_to(env.pos[:, None], env._centres.shape)
+    sight = np.concatenate([pov, env._centres], axis=-1)
+    blocked = kernel.intersect(sight, env.walls).mask.any(axis=2)
+    assert np.array_equal(visible.reshape(5, -1), ~blocked)
+
+    cell = env.size[:, None] / (11, 7)
+    x, y = (env.pos[:, None] / cell)[:, 0].astype(int).T
+    assert visible[np.arange(5), y, x].all()  # the guard sees where it is
+    assert (ghost_map[~visible] == 0).all()
+    assert ghost_map.sum() <= env.alive.sum()
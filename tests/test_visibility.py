@@ -0,0 +1,74 @@
+from museumghosts import (
+    Line,
+    Position,
+    Wall,
+    line_segments,
+    visible_segments,
+    visibility_polygon,
+)
+
+
+def linepts(x1, y1, x2, y2):
+    return Line(Position(x1, y1), Position(x2, y2))
+
+
+def _box(x1, y1, x2, y2):
+    return [
+        Wall(linepts(x1, y1, x2, y1)),
+        Wall(linepts(x2, y1, x2, y2)),
+        Wall(linepts(x2, y2, x1, y2)),
+        Wall(linepts(x1, y2, x1, y1)),
+    ]
+
+
+def test_visible_segments():
+    topline = linepts(5, 1, 12, 1)
+    botline = linepts(1, 3, 8, 3)
+    pov = Position(4, 9)
+    walls = [Wall(topline), Wall(botline)]
+
+    segments = set(visible_segments(pov, walls))
+    assert segments == set([linepts(9.3333333333333333, 1, 12, 1), linepts(1, 3, 8, 3)])
+
+    # line_segments reports the same parts, only split more finely
+    old = set(line_segments(pov, walls, visible=True))
+    assert old == set(
+        [
+            linepts(9.3333333333333333, 1, 12, 1),
+            linepts(1, 3, 4.75, 3),
+            linepts(4.75, 3, 8, 3),
+        ]
+    )
+
+
+def test_visible_segments_box():
+    # inside a box every wall is visible in full
+    segments = list(visible_segments(Position(3, 4), _box(0, 0, 10, 10)))
+    length = sum(seg.p1.dist(seg.p2) for seg in segments)
+    assert abs(length - 40) < 1e-9
+
+
+def test_visibility_polygon_box():
+    polygon = visibility_polygon(Position(3, 4), _box(0, 0, 10, 10))
+    corners = [Position(0, 0), Position(10, 0), Position(10, 10), Position(0, 10)]
+    assert set(corners) <= set(polygon)
+    assert Position(3, 4) not in polygon
+
+
+def test_visibility_polygon_occluded():
+    walls = _box(0, 0, 10, 10) + [Wall(linepts(4, 2, 6, 2))]
+    polygon = visibility_polygon(Position(5, 5), walls)
+    assert Position(4, 2) in polygon
+    assert Position(6, 2) in polygon
+    # the shadow of the inner wall on the box spans x from 10/3 to 20/3
+    on_floor = sorted(p.x for p in polygon if p.y == 0)
+    assert on_floor[0] == 0 and on_floor[-1] == 10
+    assert abs(on_floor[1] - 10 / 3) < 1e-9
+    assert abs(on_floor[2] - 20 / 3) < 1e-9
+
+
+def test_visibility_polygon_open():
+    polygon = visibility_polygon(Position(0, 0), [Wall(linepts(1, -1, 1, 1))])
+    assert Position(0, 0) in polygon
+    assert Position(1, -1) in polygon
+    assert Position(1, 1) in polygon